@@ -130,6 +130,8 @@ PHASES = {
         ],
         "show_prompt": True,
         "allow_skip": False,
+        "batch_images": True,
+        "batch_max_workers": 4,
     }
 }
 
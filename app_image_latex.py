@@ -92,6 +92,10 @@ PHASES = {
         ],
         "show_prompt": True,
         "allow_skip": False,
+        "batch_images": True,
+        "batch_max_workers": 4,
+        "ocr_prepass": True,
+        "ocr_min_confidence": 90,
         "ai_response": True,
         "allow_revisions": True,
     }
@@ -79,6 +79,9 @@ PHASES = {
         ],
         "show_prompt": True,
         "allow_skip": False,
+        "batch_images": True,
+        "batch_max_workers": 4,
+        "ocr_prepass": True,
         "ai_response": True,
         "allow_revisions": True,
     }
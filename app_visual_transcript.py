@@ -2,23 +2,29 @@ import streamlit as st
 import cv2
 import tempfile
 import os
-from visual_transcription.src.api_calls import analyze_image_Azure_Vision_Analysis, analyze_image_gpt4  # Your custom function to call the API
-from visual_transcription.utils.initialise_LLM_models import Azure_Vision_analyse_dict
-from visual_transcription.utils.utilities import get_frame_timestamp, image_to_base64, insert_VT_into_AT
+from dotenv import load_dotenv
+from visual_transcription.src.vision_backends import VISION_BACKENDS, get_backend  # Registered vision models
+from visual_transcription.utils.utilities import get_frame_timestamp, insert_VT_into_AT
+from visual_transcription.utils.frame_server import FrameServer
+from visual_transcription.utils.image_encoding import thumbnail_base64
+from visual_transcription.utils.settings_store import get_repository
 import json
 
+load_dotenv()
+
 # -----------------------------------------------
 # Initialise some of the session_state values
 # -----------------------------------------------
 
-if "Azure Vision Add Captions" not in st.session_state:
-    st.session_state["Azure Vision Add Captions"] = Azure_Vision_analyse_dict #TODO: Make more efficient - only one if statement required
+# Each backend keeps its settings (visual features, prompt, ...) under its name; clients are shared by the backends
+for backend_name, backend in VISION_BACKENDS.items():
+    if backend_name not in st.session_state:
+        st.session_state[backend_name] = {"visual_features": list(backend.default_features)}
 
-if "gpt-4o" not in st.session_state:
-    with open(r"visual_transcription\utils\chat_GPT.json", "r") as json_file:
-        gpt4o_into = json.load(json_file)
-        st.session_state['gpt-4o'] = {"prompt": gpt4o_into["prompt"], "max_words": gpt4o_into["max_words"]}
-        st.session_state['gpt-4o']["prompt"] = st.session_state['gpt-4o']["prompt"].replace("%MAX_WORDS%", gpt4o_into["max_words"])
+if "prompt" not in st.session_state["gpt-4o"]:
+    # Prompt profiles are parsed once per process and shared by every session
+    gpt4o_profile = get_repository().prompt("chat_GPT")
+    st.session_state['gpt-4o'] = {"prompt": gpt4o_profile.render(), "max_words": gpt4o_profile.max_words}
 
 if "saved_frames" not in st.session_state:
     st.session_state.saved_frames = dict()
@@ -45,17 +51,19 @@ if st.session_state.audio_transcript == []:
 # -----------------------------------------------
 # Model Selection
 # -----------------------------------------------
-model_options = ['Azure Vision Add Captions', 'gpt-4o', 'Model C']
+model_options = list(VISION_BACKENDS)
 selected_model = st.selectbox('Select a model for visual transcription', model_options)
 st.session_state['selected_model'] = selected_model
+selected_backend = get_backend(selected_model)
 
 # -----------------------------------------------
 # Display informaiton that is relevant to the selected_model
 # -----------------------------------------------
-if st.session_state['selected_model'] == "Azure Vision Add Captions":
-    visual_features_model_options = ["TAGS", "OBJECTS", "CAPTION", "DENSE_CAPTIONS", "READ", "SMART_CROPS", "PEOPLE"]
-    visual_features = st.multiselect('Select the visual aspects that the model should transcribe', visual_features_model_options)
-    st.session_state['Azure Vision Add Captions']["visual_features"] = visual_features
+if selected_backend.features:
+    # Only the selected features are requested, so each extra one costs latency and money
+    visual_features = st.multiselect('Select the visual aspects that the model should transcribe', selected_backend.features,
+                                     default=st.session_state[selected_model]["visual_features"])
+    st.session_state[selected_model]["visual_features"] = visual_features
 
 if st.session_state['selected_model'] == "gpt-4o":
 
@@ -129,9 +137,9 @@ if uploaded_file is not None:
         if not os.path.exists(temp_file_path):
             st.error('Temporary file was not created successfully.')
         else:
-            st.session_state.video = cv2.VideoCapture(temp_file_path)
+            st.session_state.video = FrameServer(temp_file_path)
             if st.session_state.video.isOpened():
-                st.session_state.total_frames = int(st.session_state.video.get(cv2.CAP_PROP_FRAME_COUNT))
+                st.session_state.total_frames = st.session_state.video.total_frames
                 st.session_state.uploaded = True
             else:
                 st.error('Could not open video file.')
@@ -146,11 +154,13 @@ if st.session_state.uploaded:
     st.write(f"frame_number: {st.session_state.frame_number}")
 
     stframe = st.empty()
-    st.session_state.video.set(cv2.CAP_PROP_POS_FRAMES, st.session_state.frame_number)
-    ret, frame = st.session_state.video.read()
-    if ret:
+    frame = st.session_state.video.read_frame(st.session_state.frame_number)
+    if frame is not None:
         frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         stframe.image(frame_rgb, channels='RGB')
+        frame_stats = st.session_state.video.latency_stats()
+        st.caption(f"Frame load: p50 {frame_stats['p50_ms']:.1f} ms, p95 {frame_stats['p95_ms']:.1f} ms, "
+                   f"cache hits {frame_stats['hit_rate']:.0%}")
     else:
         st.error('Could not read the frame.')
 
@@ -163,9 +173,8 @@ with col1:
 with col2:
     if st.button('Save Frame Index'):
         # Ensure we capture the correct frame
-        st.session_state.video.set(cv2.CAP_PROP_POS_FRAMES, st.session_state.frame_number)
-        ret, frame = st.session_state.video.read()
-        if ret:
+        frame = st.session_state.video.read_frame(st.session_state.frame_number)
+        if frame is not None:
             frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             st.session_state.saved_frames[st.session_state.frame_number] = {
                 'frame': frame_rgb,
@@ -186,8 +195,20 @@ with col3:
 # -----------------------------------------------
 with st.sidebar:
     st.markdown("### Selected Frames")
+    # Send every frame without a transcript to the selected model at once
+    pending_frames = {n: info['frame'] for n, info in st.session_state.saved_frames.items() if not info['has_visual_transcripts']}
+    if len(pending_frames) > 1 and st.button(f"Transcribe all {len(pending_frames)} frames", key="transcribe_all"):
+        for frame_index, message, error in selected_backend.analyze_batch(pending_frames, st.session_state[selected_model]):
+            if error is not None:
+                st.error(f"Frame {frame_index} failed: {error}")
+                continue
+            st.session_state.saved_frames[frame_index]['visual_transcripts'] = message
+            st.session_state.saved_frames[frame_index]['has_visual_transcripts'] = True
+            st.session_state.saved_frames[frame_index]['time_stamp'] = get_frame_timestamp(frame_index, st.session_state.video)
+        st.success("Visual transcriptions updated.")
+
     for frame_index, frame_info in sorted(st.session_state.saved_frames.items()):
-        base64_img = image_to_base64(frame_info['frame'])
+        base64_img = thumbnail_base64(frame_info)
         transcript_text = frame_info['visual_transcripts'] if frame_info['visual_transcripts'] else 'No transcript yet'
         
         # Display the card using Markdown for styling
@@ -203,23 +224,8 @@ with st.sidebar:
         if not frame_info['has_visual_transcripts']:
             if st.button(f"Transcribe frame {frame_index}", key=f"btn_{frame_index}"):
 
-                if st.session_state['selected_model'] == "Azure Vision Add Captions":
-                    response = analyze_image_Azure_Vision_Analysis(frame_info['frame'], st.session_state[st.session_state['selected_model']]['client'], st.session_state['Azure Vision Add Captions']["visual_features"])
-                    message = response["message"]
-
-
-                elif st.session_state['selected_model'] == "gpt-4o":
-                    response = analyze_image_gpt4(frame_info['frame'], st.session_state["gpt-4o"]["prompt"])
-                    choices = response["choices"]
-                    message = choices[0]["message"]["content"]
-
-                # elif st.session_state['selected_model'] == "new model":
-                #     response = MODEL_FUNCTION(INPUTS)
-                #     choices = response["choices"]
-                #     message = choices[0]["message"]["content"]
-
-                else:
-                    raise ValueError("Invalid model selected")
+                # New models are added by registering a backend in visual_transcription/src/vision_backends.py
+                message = selected_backend.analyze(frame_info['frame'], st.session_state[selected_model])
 
                 print("This is the session state: ", st.session_state['selected_model'])
 
@@ -1,31 +1,142 @@
 import os
-import importlib
+import io
+import ast
+import json
+import time
+import base64
+import hashlib
+import logging
+import mimetypes
+import tempfile
+from functools import lru_cache
 import streamlit as st
+from PIL import Image, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
 
 # Path to the current directory (where the apps are located)
 CURRENT_DIR = os.path.dirname(__file__)
 APP_IMAGES_DIR = os.path.join(CURRENT_DIR, "app_images")  # Folder where app images are stored
+# Metadata read from each app, cached by file mtime/size and content hash
+INDEX_FILE = os.path.join(CURRENT_DIR, ".apps_index.json")
+INDEX_VERSION = 1
+
+# Card thumbnails: app images are resized once to fit this box (2x the card width for high-density screens)
+THUMBNAIL_MAX_SIZE = (640, 640)
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_DIR = os.path.join(CURRENT_DIR, ".thumbnails")
+# Number of encoded thumbnails kept in memory by the process
+THUMBNAIL_CACHE_SIZE = 64
+
+# Module-level constants read from each app file
+METADATA_CONSTANTS = ("APP_TITLE", "APP_INTRO", "APP_IMAGE", "APP_URL", "PUBLISHED")
+
+def parse_app_constants(source):
+    """Read the literal values of the metadata constants from an app's source without running it."""
+    constants = {}
+    for node in ast.parse(source).body:
+        if isinstance(node, ast.Assign):
+            targets = node.targets
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            targets = [node.target]
+        else:
+            continue
+        for target in targets:
+            if isinstance(target, ast.Name) and target.id in METADATA_CONSTANTS:
+                try:
+                    constants[target.id] = ast.literal_eval(node.value)
+                except ValueError:
+                    # Computed values cannot be read statically; the default is used instead
+                    pass
+    return constants
+
+def load_index():
+    """Load the metadata index, or start an empty one if it is missing, unreadable or outdated."""
+    try:
+        with open(INDEX_FILE, "r", encoding="utf-8") as index_file:
+            index = json.load(index_file)
+        if index.get("version") == INDEX_VERSION:
+            return index
+    except (OSError, ValueError):
+        pass
+    return {"version": INDEX_VERSION, "apps": {}}
+
+def write_atomically(path, data):
+    """
+    Replace 'path' with 'data' (bytes) so a concurrent reader never sees a partial file. Each write
+    uses its own temporary file, so concurrent sessions (threads of one process) cannot clobber each other.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            temp_file.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+def save_index(index):
+    """Write the index atomically so a concurrent reader never sees a partial file."""
+    try:
+        write_atomically(INDEX_FILE, json.dumps(index, indent=2, sort_keys=True).encode("utf-8"))
+    except OSError as e:
+        print(f"Could not write the apps index: {e}")
+
+def index_app(app_file, entry):
+    """
+    Return the index entry for an app file, re-reading it only if it changed.
+    Unchanged mtime and size skip the read; unchanged content skips the parse.
+    """
+    stat = os.stat(os.path.join(CURRENT_DIR, app_file))
+    if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+        return entry
 
-def get_app_metadata(app_file):
-    """Dynamically import each app file and extract its metadata."""
+    with open(os.path.join(CURRENT_DIR, app_file), "rb") as source_file:
+        source = source_file.read()
+    sha256 = hashlib.sha256(source).hexdigest()
+    if entry and entry["sha256"] == sha256:
+        constants = entry["constants"]
+    else:
+        try:
+            constants = parse_app_constants(source)
+        except SyntaxError as e:
+            print(f"Could not read metadata from {app_file}: {e}")
+            constants = {}
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": sha256, "constants": constants}
+
+def get_apps_constants():
+    """Return {app_file: constants} for every app, updating the index for new, changed and removed files."""
+    index = load_index()
+    app_files = sorted(f for f in os.listdir(CURRENT_DIR) if f.startswith("app_") and f.endswith(".py"))
+
+    apps = {app_file: index_app(app_file, index["apps"].get(app_file)) for app_file in app_files}
+    if apps != index["apps"]:
+        index["apps"] = apps
+        save_index(index)
+    return {app_file: entry["constants"] for app_file, entry in apps.items()}
+
+def get_app_metadata(app_file, constants):
+    """Build the card metadata of an app from its statically read constants."""
     module_name = os.path.splitext(app_file)[0]
-    app_module = importlib.import_module(module_name)
 
     # Use the provided APP_IMAGE from the app module, or fall back to a placeholder image
-    image_file_name = getattr(app_module, "APP_IMAGE", "placeholder.png")  # Assume default image is 'placeholder.jpg'
+    image_file_name = constants.get("APP_IMAGE", "placeholder.png")  # Assume default image is 'placeholder.jpg'
     image_path = os.path.join(APP_IMAGES_DIR, image_file_name)
 
     # If the image doesn't exist, fall back to the placeholder image
     if not os.path.exists(image_path):
         image_path = os.path.join(APP_IMAGES_DIR, "placeholder.jpg")
 
-    # Extract metadata from the app module
+    # Extract metadata from the app constants
     metadata = {
-        "title": getattr(app_module, "APP_TITLE", module_name.replace("app_", "").replace("_", " ").title()),
-        "description": getattr(app_module, "APP_INTRO", "No description provided."),
+        "title": constants.get("APP_TITLE", module_name.replace("app_", "").replace("_", " ").title()),
+        "description": constants.get("APP_INTRO", "No description provided."),
         "image": image_path,
-        "url": getattr(app_module, "APP_URL", app_file),
-        "published": getattr(app_module, "PUBLISHED", False),
+        "url": constants.get("APP_URL", app_file),
+        "published": constants.get("PUBLISHED", False),
     }
     return metadata
 
@@ -88,14 +199,18 @@ def display_apps(apps_metadata):
     # Creating a responsive card layout
     cols = st.columns(4)  # Define a 4-column layout, adjust as necessary
     app_number = 1  # Initialize a counter for numbering apps
+    started = time.perf_counter()
+    page_weight = 0
 
     for idx, app in enumerate(apps_metadata):
         if app.get('published', False):  # Check if the app is published
             col = cols[(app_number-1) % 4]  # Cycle through the columns
+            image_url = get_thumbnail_data_url(app['image'])
+            page_weight += len(image_url)
             with col:
                 st.markdown(f"""
                     <a class="no-underline" href="{app['url']}" target="_blank"><div class="card">
-                        <img src="data:image/jpeg;base64,{get_image_base64(app['image'])}" alt="{app['title']}">
+                        <img src="{image_url}" alt="{app['title']}">
                         <div class="card-title">{app['title']}</div>
                         <div class="card-description">{app['description']}</div>
                         <a href="{app['url']}" target="_blank">View App</a>
@@ -103,30 +218,66 @@ def display_apps(apps_metadata):
                 """, unsafe_allow_html=True)
             app_number += 1  # Increment the counter
 
-def get_image_base64(image_path):
-    """Convert an image to base64 for inline rendering."""
-    import base64
+    logger.debug("Rendered %d app cards with %.0f KB of inline images in %.0f ms",
+                 app_number - 1, page_weight / 1024, (time.perf_counter() - started) * 1000)
+
+def build_thumbnail(image_path):
+    """
+    Resize an app image to card size, storing the result on disk keyed by the source's content hash.
+    Returns (mime_type, bytes). Images that are already small, or not readable, are used as they are.
+    """
+    with open(image_path, "rb") as img_file:
+        data = img_file.read()
+    mime_type = mimetypes.guess_type(image_path)[0] or "application/octet-stream"
+    width, height = THUMBNAIL_MAX_SIZE
+    thumbnail_path = os.path.join(THUMBNAIL_DIR, f"{hashlib.sha256(data).hexdigest()}_{width}x{height}.webp")
+    if os.path.isfile(thumbnail_path):
+        with open(thumbnail_path, "rb") as thumbnail_file:
+            return "image/webp", thumbnail_file.read()
+
     try:
-        if not os.path.isfile(image_path):
-            raise FileNotFoundError(f"Image file not found: {image_path}")
-        with open(image_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode("utf-8")
-    except FileNotFoundError:
+        image = Image.open(io.BytesIO(data))
+        if image.width <= width and image.height <= height:
+            return mime_type, data
+        image.draft("RGB", THUMBNAIL_MAX_SIZE)
+        image.thumbnail(THUMBNAIL_MAX_SIZE, Image.LANCZOS)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        buffer = io.BytesIO()
+        image.save(buffer, format="WEBP", quality=THUMBNAIL_QUALITY, method=6)
+        thumbnail = buffer.getvalue()
+    except (UnidentifiedImageError, OSError, ValueError):
+        return mime_type, data
+    if len(thumbnail) >= len(data):
+        return mime_type, data
+
+    try:
+        os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+        write_atomically(thumbnail_path, thumbnail)
+    except OSError as e:
+        print(f"Could not store thumbnail for {image_path}: {e}")
+    return "image/webp", thumbnail
+
+@lru_cache(maxsize=THUMBNAIL_CACHE_SIZE)
+def _thumbnail_data_url(image_path, mtime_ns, size):
+    mime_type, data = build_thumbnail(image_path)
+    return f"data:{mime_type};base64,{base64.b64encode(data).decode('utf-8')}"
+
+def get_thumbnail_data_url(image_path):
+    """Return the card thumbnail of an image as a data URL with its real MIME type, cached per process."""
+    if not os.path.isfile(image_path):
         print(f"Using placeholder image for missing file: {image_path}")
-        placeholder_path = os.path.join(APP_IMAGES_DIR, "placeholder.jpg")
-        with open(placeholder_path, "rb") as placeholder_file:
-            return base64.b64encode(placeholder_file.read()).decode("utf-8")
+        image_path = os.path.join(APP_IMAGES_DIR, "placeholder.jpg")
+    stat = os.stat(image_path)
+    # The file's mtime and size are part of the key, so an edited image is picked up without a restart
+    return _thumbnail_data_url(image_path, stat.st_mtime_ns, stat.st_size)
 
 def main():
     st.set_page_config(page_title="AI MicroApps", page_icon="app_images/construct.webp", layout="wide")
     st.title("AI MicroApps Directory")
 
-    # Scan for all app files (starting with 'app_' and ending in '.py')
-    apps_metadata = []
-    for app_file in os.listdir(CURRENT_DIR):
-        if app_file.startswith("app_") and app_file.endswith(".py"):
-            metadata = get_app_metadata(app_file)
-            apps_metadata.append(metadata)
+    # Scan for all app files (starting with 'app_' and ending in '.py') without importing them
+    apps_metadata = [get_app_metadata(app_file, constants) for app_file, constants in get_apps_constants().items()]
 
     # Sort apps metadata alphabetically by title
     apps_metadata.sort(key=lambda x: x["title"])
@@ -154,6 +154,8 @@ LLM_CONFIG_OVERRIDE = {"gpt-4o-mini": {
 
 SCORING_DEBUG_MODE = True
 DISPLAY_COST = True
+# Show retry, rate-limit, fallback and OCR counters in the sidebar
+DISPLAY_METRICS = False
 
 COMPLETION_MESSAGE = "You've reached the end! I hope you learned something!"
 COMPLETION_CELEBRATION = False
@@ -192,6 +194,7 @@ config = {
     "COMPLETION_CELEBRATION": COMPLETION_CELEBRATION,
     "SCORING_DEBUG_MODE": SCORING_DEBUG_MODE,
     "DISPLAY_COST": DISPLAY_COST,
+    "DISPLAY_METRICS": DISPLAY_METRICS,
     "RAG_IMPLEMENTATION": RAG_IMPLEMENTATION,
     "SOURCE_DOCUMENT": SOURCE_DOCUMENT,
     "PAGE_CONFIG": PAGE_CONFIG,
@@ -0,0 +1,64 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from core_logic import metrics
+from core_logic.retry import new_deadline
+from core_logic.routing import route_completion, succeeded
+
+# Defaults for phases with "batch_images": True. Override per phase with
+# "batch_group_size", "batch_max_workers" and "batch_max_retries".
+BATCH_SETTINGS = {
+    "group_size": 1,      # images sent together in one request
+    "max_workers": 4,     # requests in flight at once for one submission
+    "max_retries": 1,     # extra rounds for images whose request failed
+}
+
+
+def group_images(image_urls, group_size):
+    """Split the images into consecutive groups of at most 'group_size', keeping upload order."""
+    group_size = max(1, int(group_size))
+    return [image_urls[i:i + group_size] for i in range(0, len(image_urls), group_size)]
+
+
+def _route_with_deadline(attempts, hedge, retry_policy):
+    # The deadline starts when a worker picks the group up, so groups queued behind others keep their full budget
+    deadline = new_deadline(retry_policy)
+    for attempt in attempts:
+        attempt["context"]["deadline"] = deadline
+    return route_completion(attempts, hedge)
+
+
+def run_batch(attempts_by_index, max_workers, hedge=False, retry_policy=None):
+    """
+    Route each prepared request concurrently with at most 'max_workers' in flight.
+    'attempts_by_index' maps a group index to its fallback chain (see routing.route_completion).
+    Each group gets its own deadline (see retry.new_deadline), bounding its rate-limit wait and retries.
+    Yields (index, result, ok) in completion order.
+    """
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="llm-batch") as executor:
+        futures = {executor.submit(_route_with_deadline, attempts, hedge, retry_policy): index
+                   for index, attempts in attempts_by_index.items()}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                result = future.result()
+                ok = succeeded(attempts_by_index[index])
+            except Exception as e:
+                result, ok = (f"Unexpected error while processing this image: {e}", 0), False
+            metrics.increment("batch_requests", outcome="ok" if ok else "failed")
+            yield index, result, ok
+    metrics.observe("batch_seconds", time.monotonic() - started)
+
+
+def combine_results(results, groups):
+    """Join per-group responses into one response, labelled in upload order."""
+    sections = []
+    image_number = 1
+    for (text, _), group in zip(results, groups):
+        if len(group) == 1:
+            label = f"Image {image_number}"
+        else:
+            label = f"Images {image_number}-{image_number + len(group) - 1}"
+        sections.append(f"**{label}**\n\n{text}")
+        image_number += len(group)
+    return "\n\n---\n\n".join(sections)
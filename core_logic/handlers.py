@@ -2,10 +2,12 @@ import openai
 import anthropic
 import google.generativeai as genai
 from core_logic import rag_pipeline
+from core_logic.retry import call_with_retry
 import requests
 import os
 from dotenv import load_dotenv
 import re
+import json
 
 load_dotenv()
 
@@ -41,50 +43,116 @@ def format_chat_history(chat_history, family):
                 ])
     return formatted_history
 
+# prompt caching helpers
+def cache_control_block(text):
+    """Build a Claude text block marked as a cacheable prompt prefix."""
+    block = {"type": "text", "text": text}
+    if text:
+        block["cache_control"] = {"type": "ephemeral"}
+    return block
+
+def calculate_execution_price(context, input_tokens, output_tokens, cached_tokens=0, cache_write_tokens=0):
+    """
+    Calculate the price of a request from its token usage.
+    'input_tokens' are the uncached prompt tokens; cache reads and writes are billed at their own rates.
+    """
+    price_input = context["price_input_token_1M"]
+    price_cached = context.get("price_cached_input_token_1M", price_input)
+    price_cache_write = context.get("price_cache_write_token_1M", price_input)
+    input_price = int(input_tokens) * price_input / 1000000
+    cached_price = int(cached_tokens) * price_cached / 1000000
+    cache_write_price = int(cache_write_tokens) * price_cache_write / 1000000
+    output_price = int(output_tokens) * context["price_output_token_1M"] / 1000000
+    return input_price + cached_price + cache_write_price + output_price
+
+# structured output helpers
+def strip_schema_keywords(schema, keywords):
+    """Return a copy of a JSON schema without the keywords a provider does not accept."""
+    stripped = {}
+    for key, value in schema.items():
+        if key in keywords:
+            continue
+        if key == "properties":
+            value = {name: strip_schema_keywords(prop, keywords) for name, prop in value.items()}
+        elif key == "items":
+            value = strip_schema_keywords(value, keywords)
+        stripped[key] = value
+    return stripped
+
 # openai llm handler
 def handle_openai(context):
     """Handle requests for OpenAI models."""
     if not context["supports_image"] and context.get("image_urls"):
-        return "Images are not supported by selected model."
+        context["error"] = "Images are not supported by selected model."
+        return context["error"], 0
     try:
         openai.api_key = get_api_key("openai")
+        openai.max_retries = 0  # retries are handled by call_with_retry
 
-        messages = format_chat_history(context["chat_history"], "openai") + [
-            {"role": "system", "content": context["SYSTEM_PROMPT"]},
-            {"role": "assistant", "content": context["phase_instructions"]},
-            {"role": "user", "content": context["user_prompt"]}
+        # OpenAI caches the longest repeated prefix automatically, so the stable parts
+        # (system prompt, then the history that only grows) go first.
+        messages = [{"role": "system", "content": context["SYSTEM_PROMPT"]}] + format_chat_history(
+            context["chat_history"], "openai") + [
+            {"role": "system", "content": context["phase_instructions"]}
         ]
 
         if context["supports_image"] and context["image_urls"]:
-            messages.insert(2, {"role": "user", "content": [{"type": "image_url", "image_url": {"url": url}} for url in
-                                                            context["image_urls"]]})
+            messages.append({"role": "user", "content": [{"type": "image_url", "image_url": {"url": url}} for url in
+                                                         context["image_urls"]]})
 
-        response = openai.chat.completions.create(
+        messages.append({"role": "user", "content": context["user_prompt"]})
+
+        # Structured output: strict JSON schema mode (numeric bounds are checked by the caller)
+        options = {}
+        if context.get("response_schema"):
+            options["response_format"] = {"type": "json_schema", "json_schema": {
+                "name": context["response_schema"]["name"],
+                "schema": strip_schema_keywords(context["response_schema"]["schema"], {"minimum", "maximum"}),
+                "strict": True}}
+
+        response = call_with_retry(lambda timeout: openai.chat.completions.create(
             model=context["model"],
             messages=messages,
             temperature=context["temperature"],
             max_tokens=context["max_tokens"],
             top_p=context["top_p"],
             frequency_penalty=context["frequency_penalty"],
-            presence_penalty=context["presence_penalty"]
+            presence_penalty=context["presence_penalty"],
+            timeout=timeout,
+            **options
+        ), "openai", context.get("deadline"), context.get("retry_policy"),
+            context.get("cancel_event"))
+        prompt_tokens = int(getattr(response.usage, 'prompt_tokens', 0) or 0)
+        prompt_details = getattr(response.usage, 'prompt_tokens_details', None)
+        cached_tokens = int(getattr(prompt_details, 'cached_tokens', 0) or 0)
+        execution_price = calculate_execution_price(
+            context,
+            input_tokens=prompt_tokens - cached_tokens,
+            output_tokens=getattr(response.usage, 'completion_tokens', 0) or 0,
+            cached_tokens=cached_tokens
         )
-        input_price = int(getattr(response.usage, 'prompt_tokens', 0)) * context["price_input_token_1M"] / 1000000
-        output_price = int(getattr(response.usage, 'completion_tokens', 0)) * context["price_output_token_1M"] / 1000000
-        execution_price = input_price + output_price
         return response.choices[0].message.content, execution_price
     except Exception as e:
-        return f"Unexpected error while handling OpenAI request: {e}"
+        context["error"] = e
+        return f"Unexpected error while handling OpenAI request: {e}", 0
 
 # claude llm handler
 def handle_claude(context):
     """Handle requests for Claude models."""
     if not context["supports_image"] and context.get("image_urls"):
-        return "Images are not supported by selected model."
+        context["error"] = "Images are not supported by selected model."
+        return context["error"], 0
     try:
-        client = anthropic.Anthropic(api_key=get_api_key("claude"))
+        client = anthropic.Anthropic(api_key=get_api_key("claude"), max_retries=0)
+
+        # Cache breakpoints sit on the system prompt and on the end of the history. The next turn's
+        # history starts with this one's, so it reads that prefix from the cache and only writes the new turn.
+        history = format_chat_history(context["chat_history"], "claude")
+        if history:
+            history[-1] = {"role": history[-1]["role"], "content": [cache_control_block(history[-1]["content"])]}
 
         # Clean up any trailing whitespace in the messages
-        messages = format_chat_history(context["chat_history"], "claude") + [
+        messages = history + [
             {"role": "user", "content": [{"type": "text", "text": context["phase_instructions"].strip()}]},
             {"role": "user", "content": [{"type": "text", "text": context["user_prompt"].strip()}]},
         ]
@@ -107,20 +175,40 @@ def handle_claude(context):
                         }
                     }]
                 })
-        response = client.messages.create(
+
+        # Structured output: force a tool call whose input follows the schema
+        options = {}
+        if context.get("response_schema"):
+            tool_name = context["response_schema"]["name"]
+            options["tools"] = [{"name": tool_name, "description": "Record the structured response.",
+                                 "input_schema": context["response_schema"]["schema"]}]
+            options["tool_choice"] = {"type": "tool", "name": tool_name}
+
+        response = call_with_retry(lambda timeout: client.messages.create(
             model=context["model"],
             max_tokens=context["max_tokens"],
             temperature=context["temperature"],
-            system=f"{context['SYSTEM_PROMPT']}",
-            messages=messages
+            system=[cache_control_block(context["SYSTEM_PROMPT"])] if context["SYSTEM_PROMPT"] else "",
+            messages=messages,
+            timeout=timeout,
+            **options
+        ), "claude", context.get("deadline"), context.get("retry_policy"),
+            context.get("cancel_event"))
+        execution_price = calculate_execution_price(
+            context,
+            input_tokens=getattr(response.usage, 'input_tokens', 0) or 0,
+            output_tokens=getattr(response.usage, 'output_tokens', 0) or 0,
+            cached_tokens=getattr(response.usage, 'cache_read_input_tokens', 0) or 0,
+            cache_write_tokens=getattr(response.usage, 'cache_creation_input_tokens', 0) or 0
         )
-        input_price = int(getattr(response.usage, 'input_tokens', 0)) * context["price_input_token_1M"] / 1000000
-        output_price = int(getattr(response.usage, 'output_tokens', 0)) * context["price_output_token_1M"] / 1000000
-        execution_price = input_price + output_price
         
+        tool_inputs = [block.input for block in response.content if block.type == 'tool_use']
+        if context.get("response_schema") and tool_inputs:
+            return json.dumps(tool_inputs[0]), execution_price
         response_text = '\n'.join([block.text for block in response.content if block.type == 'text'])
         return response_text, execution_price
     except Exception as e:
+        context["error"] = e
         execution_price = 0
         return f"Unexpected error while handling Claude request: {e}", execution_price
 
@@ -128,7 +216,8 @@ def handle_claude(context):
 def handle_gemini(context):
     """Handle requests for Gemini models."""
     if not context["supports_image"] and context.get("image_urls"):
-        return "Images are not supported by selected model."
+        context["error"] = "Images are not supported by selected model."
+        return context["error"], 0
     try:
         genai.configure(api_key=get_api_key("google"))
 
@@ -145,26 +234,44 @@ def handle_gemini(context):
                     "parts": [image_url]
                 })
 
+        generation_config = {"temperature": context["temperature"],"top_p": context["top_p"],"max_output_tokens": context["max_tokens"],"response_mime_type":"text/plain"}
+        # Structured output: JSON constrained to the schema's OpenAPI subset
+        if context.get("response_schema"):
+            generation_config["response_mime_type"] = "application/json"
+            generation_config["response_schema"] = strip_schema_keywords(
+                context["response_schema"]["schema"], {"additionalProperties", "minimum", "maximum"})
+
         chat_session = genai.GenerativeModel(
             model_name=context["model"],
-            generation_config= {"temperature": context["temperature"],"top_p": context["top_p"],"max_output_tokens": context["max_tokens"],"response_mime_type":"text/plain"},
+            generation_config=generation_config,
             system_instruction=context["SYSTEM_PROMPT"]
         ).start_chat(history=messages)
 
-        response = chat_session.send_message(context["user_prompt"])
-
-        input_price = getattr(response.usage_metadata, 'prompt_token_count', 0) * context["price_input_token_1M"] / 1000000
-        output_price = getattr(response.usage_metadata, 'candidates_token_count', 0) * context["price_output_token_1M"] / 1000000
-        execution_price = input_price + output_price
+        response = call_with_retry(
+            lambda timeout: chat_session.send_message(context["user_prompt"], request_options={"timeout": timeout}),
+            "gemini", context.get("deadline"), context.get("retry_policy"),
+            context.get("cancel_event"))
+
+        # Gemini reports implicitly cached prefix tokens as part of the prompt token count
+        prompt_tokens = getattr(response.usage_metadata, 'prompt_token_count', 0) or 0
+        cached_tokens = getattr(response.usage_metadata, 'cached_content_token_count', 0) or 0
+        execution_price = calculate_execution_price(
+            context,
+            input_tokens=prompt_tokens - cached_tokens,
+            output_tokens=getattr(response.usage_metadata, 'candidates_token_count', 0) or 0,
+            cached_tokens=cached_tokens
+        )
         return response.text, execution_price
     except Exception as e:
+        context["error"] = e
         return f"Unexpected error while handling Gemini request: {e}", 0
 
 # perplexity handler
 def handle_perplexity(context):
     """Handle requests for Perplexity models."""
     if not context["supports_image"] and context.get("image_urls"):
-        return "Images are not supported by selected model."
+        context["error"] = "Images are not supported by selected model."
+        return context["error"], 0
     api_key = get_api_key("perplexity")
     url = "https://api.perplexity.ai/chat/completions"
     execution_price = 0
@@ -191,6 +298,9 @@ def handle_perplexity(context):
         "model": context["model"],
         "messages": messages
     }
+    if context.get("response_schema"):
+        payload["response_format"] = {"type": "json_schema",
+                                      "json_schema": {"schema": context["response_schema"]["schema"]}}
 
     # Prepare headers
     headers = {
@@ -201,26 +311,36 @@ def handle_perplexity(context):
 
     # Make the API request
     try:
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()  # Raise an error for bad status codes
+        def send_request(timeout):
+            response = requests.post(url, json=payload, headers=headers, timeout=timeout)
+            response.raise_for_status()  # Raise an error for bad status codes
+            return response
+
+        response = call_with_retry(send_request, "perplexity", context.get("deadline"), context.get("retry_policy"),
+            context.get("cancel_event"))
 
         response_json = response.json()
 
         if "usage" in response_json:
-            input_price = response_json["usage"]["prompt_tokens"] * context["price_input_token_1M"] / 1000000
-            output_price = response_json["usage"]["total_tokens"] * context["price_output_token_1M"] / 1000000
-            execution_price = input_price + output_price
+            execution_price = calculate_execution_price(
+                context,
+                input_tokens=response_json["usage"].get("prompt_tokens", 0),
+                output_tokens=response_json["usage"].get("completion_tokens", 0)
+            )
 
 
         
         if "choices" in response_json and len(response_json["choices"]) > 0:
             return response_json["choices"][0]["message"]["content"], execution_price
         else:
-            return "Unexpected response format from Perplexity API.", execution_price
+            context["error"] = "Unexpected response format from Perplexity API."
+            return context["error"], execution_price
 
     except requests.exceptions.HTTPError as http_err:
+        context["error"] = http_err
         return f"HTTP error occurred while handling Perplexity request: {http_err}", execution_price
     except requests.exceptions.RequestException as req_err:
+        context["error"] = req_err
         return f"Error occurred while making the Perplexity request: {req_err}", execution_price
 
 
@@ -259,6 +379,7 @@ def rag_handler(context):
         context["TOTAL_PRICE"] = context.get("TOTAL_PRICE", 0) + (cost if cost else 0)
         return rag_response
     except Exception as e:
+        context["error"] = e
         return f"Error during RAG processing: {e}"
 
 
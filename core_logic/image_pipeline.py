@@ -0,0 +1,104 @@
+import base64
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Largest image each family's vision models actually use. Providers downscale anything bigger
+# on their side, so sending more pixels only costs upload time.
+MAX_IMAGE_SIZE = {
+    "openai": {"max_edge": 2048, "max_short_side": 768},
+    "rag": {"max_edge": 2048, "max_short_side": 768},
+    "claude": {"max_edge": 1568},
+    "gemini": {"max_edge": 3072},
+    "perplexity": {"max_edge": 2048, "max_short_side": 768},
+}
+
+# Re-encoding defaults. Apps can override them with IMAGE_SETTINGS.
+IMAGE_SETTINGS = {
+    "format": "JPEG",   # JPEG or WEBP
+    "quality": 85,
+}
+
+# Number of prepared images kept in the process-wide cache
+CACHE_SIZE = 128
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def content_hash(data):
+    """Return the SHA-256 hex digest of the image bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def target_size(width, height, family):
+    """Return the (width, height) to send to a model family, never upscaling."""
+    limits = MAX_IMAGE_SIZE.get(family, MAX_IMAGE_SIZE["openai"])
+    scale = min(1.0, limits["max_edge"] / max(width, height))
+    if "max_short_side" in limits:
+        scale = min(scale, limits["max_short_side"] / min(width, height))
+    return max(1, int(round(width * scale))), max(1, int(round(height * scale)))
+
+
+def _encode(data, family, image_format, quality):
+    """Decode the image once, downscale it for 'family' and re-encode it. Returns (mime_type, bytes)."""
+    image = Image.open(io.BytesIO(data))
+    original_format = image.format
+    size = target_size(image.width, image.height, family)
+    # Let the JPEG decoder skip detail we are about to throw away
+    image.draft("RGB", size)
+    image = ImageOps.exif_transpose(image)
+    size = target_size(image.width, image.height, family)
+
+    needs_resize = size != (image.width, image.height)
+    if needs_resize:
+        image = image.resize(size, Image.LANCZOS)
+
+    if image_format == "JPEG" and image.mode != "RGB":
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.split()[-1])
+            image = background
+        else:
+            image = image.convert("RGB")
+    elif image_format == "WEBP" and image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=quality, optimize=True)
+    encoded = buffer.getvalue()
+
+    # Small images that did not need resizing may already be smaller as uploaded
+    if not needs_resize and original_format in ("JPEG", "PNG", "WEBP", "GIF") and len(data) <= len(encoded):
+        return Image.MIME[original_format], data
+    return Image.MIME[image_format], encoded
+
+
+def prepare_image(data, family, image_format=None, quality=None, fallback_mime_type="application/octet-stream"):
+    """
+    Return a base64 data URL of the image prepared for 'family', using the content-hash cache.
+    Files that are not readable images are passed through unchanged.
+    """
+    image_format = (image_format or IMAGE_SETTINGS["format"]).upper()
+    quality = quality or IMAGE_SETTINGS["quality"]
+    key = (content_hash(data), family, image_format, quality)
+
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    try:
+        mime_type, encoded = _encode(data, family, image_format, quality)
+    except (UnidentifiedImageError, OSError, ValueError):
+        mime_type, encoded = fallback_mime_type, data
+    image_url = f"data:{mime_type};base64,{base64.b64encode(encoded).decode('utf-8')}"
+
+    with _cache_lock:
+        _cache[key] = image_url
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return image_url
@@ -10,7 +10,8 @@ LLM_CONFIG = {
         "presence_penalty": 0,
         "supports_image": False,
         "price_input_token_1M": 0.15,
-        "price_output_token_1M": 0.60
+        "price_output_token_1M": 0.60,
+        "price_cached_input_token_1M": 0.075
     },
     "gpt-4-turbo": {
         "family": "openai",
@@ -22,7 +23,8 @@ LLM_CONFIG = {
         "presence_penalty": 0,
         "supports_image": True,
         "price_input_token_1M": 10,
-        "price_output_token_1M": 30
+        "price_output_token_1M": 30,
+        "price_cached_input_token_1M": 10
     },
     "rag-with-gpt-4o": {
         "family": "rag",
@@ -34,7 +36,8 @@ LLM_CONFIG = {
         "presence_penalty": 0,
         "supports_image": True,
         "price_input_token_1M": 10,
-        "price_output_token_1M": 30
+        "price_output_token_1M": 30,
+        "price_cached_input_token_1M": 10
     },
     "gpt-4o": {
         "family": "openai",
@@ -46,7 +49,8 @@ LLM_CONFIG = {
         "presence_penalty": 0,
         "supports_image": True,
         "price_input_token_1M": 2.5,
-        "price_output_token_1M": 10
+        "price_output_token_1M": 10,
+        "price_cached_input_token_1M": 1.25
     },
     "gemini-1.5-flash": {
         "family": "gemini",
@@ -58,7 +62,8 @@ LLM_CONFIG = {
         "presence_penalty": 0,
         "supports_image": False,
         "price_input_token_1M": 0.15,
-        "price_output_token_1M": 0.60
+        "price_output_token_1M": 0.60,
+        "price_cached_input_token_1M": 0.0375
     },
     "gemini-1.5-pro": {
         "family": "gemini",
@@ -70,7 +75,8 @@ LLM_CONFIG = {
         "presence_penalty": 0,
         "supports_image": True,
         "price_input_token_1M": 2.5,
-        "price_output_token_1M": 10.00
+        "price_output_token_1M": 10.00,
+        "price_cached_input_token_1M": 0.625
     },
     "claude-3.5-sonnet": {
         "family": "claude",
@@ -82,7 +88,9 @@ LLM_CONFIG = {
         "presence_penalty": 0,
         "supports_image": True,
         "price_input_token_1M": 3,
-        "price_output_token_1M": 15
+        "price_output_token_1M": 15,
+        "price_cached_input_token_1M": 0.30,
+        "price_cache_write_token_1M": 3.75
     },
     "claude-opus": {
         "family": "claude",
@@ -94,7 +102,9 @@ LLM_CONFIG = {
         "presence_penalty": 0,
         "supports_image": True,
         "price_input_token_1M": 15,
-        "price_output_token_1M": 75
+        "price_output_token_1M": 75,
+        "price_cached_input_token_1M": 1.50,
+        "price_cache_write_token_1M": 18.75
     },
     "claude-3.5-haiku": {
         "family": "claude",
@@ -106,7 +116,9 @@ LLM_CONFIG = {
         "presence_penalty": 0,
         "supports_image": False,
         "price_input_token_1M": 1,
-        "price_output_token_1M": 5
+        "price_output_token_1M": 5,
+        "price_cached_input_token_1M": 0.10,
+        "price_cache_write_token_1M": 1.25
     },
     "llama-3.1-sonar-small-128k-chat": {
         "family": "perplexity",
@@ -118,7 +130,8 @@ LLM_CONFIG = {
         "presence_penalty": 0,
         "supports_image": False,
         "price_input_token_1M": 0.20,
-        "price_output_token_1M": 0.20
+        "price_output_token_1M": 0.20,
+        "price_cached_input_token_1M": 0.20
     },
     "llama-3.1-sonar-small-128k-online": {
         "family": "perplexity",
@@ -130,7 +143,8 @@ LLM_CONFIG = {
         "presence_penalty": 0,
         "supports_image": False,
         "price_input_token_1M": 0.20,
-        "price_output_token_1M": 0.20
+        "price_output_token_1M": 0.20,
+        "price_cached_input_token_1M": 0.20
     },
     "llama-3.1-sonar-large-128k-chat": {
         "family": "perplexity",
@@ -142,7 +156,8 @@ LLM_CONFIG = {
         "presence_penalty": 0,
         "supports_image": False,
         "price_input_token_1M": 1.0,
-        "price_output_token_1M": 1.0
+        "price_output_token_1M": 1.0,
+        "price_cached_input_token_1M": 1.0
     },
     "llama-3.1-sonar-large-128k-online": {
         "family": "perplexity",
@@ -154,7 +169,8 @@ LLM_CONFIG = {
         "presence_penalty": 0,
         "supports_image": False,
         "price_input_token_1M": 1.0,
-        "price_output_token_1M": 1.0
+        "price_output_token_1M": 1.0,
+        "price_cached_input_token_1M": 1.0
     },
     "llama-3.1-8b-instruct": {
         "family": "perplexity",
@@ -166,7 +182,8 @@ LLM_CONFIG = {
         "presence_penalty": 0,
         "supports_image": False,
         "price_input_token_1M": 0.20,
-        "price_output_token_1M": 0.20
+        "price_output_token_1M": 0.20,
+        "price_cached_input_token_1M": 0.20
     },
     "llama-3.1-70b-instruct": {
         "family": "perplexity",
@@ -178,6 +195,7 @@ LLM_CONFIG = {
         "presence_penalty": 0,
         "supports_image": False,
         "price_input_token_1M": 1.0,
-        "price_output_token_1M": 1.0
+        "price_output_token_1M": 1.0,
+        "price_cached_input_token_1M": 1.0
     }
 }
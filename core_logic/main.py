@@ -1,13 +1,31 @@
 import copy
+import json
+import logging
 import re
-import base64
+import threading
+import time
+import uuid
 import mimetypes
 import streamlit as st
 from streamlit import _bottom
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from streamlit_extras.stylable_container import stylable_container
 from streamlit_extras.let_it_rain import rain
 from core_logic.handlers import HANDLERS
 from core_logic.llm_config import LLM_CONFIG
+from core_logic.token_counter import estimate_request, apply_request_budget
+from core_logic.rate_limiter import acquire_capacity
+from core_logic.retry import new_deadline
+from core_logic.routing import route_completion
+from core_logic.batch import BATCH_SETTINGS, group_images, run_batch, combine_results
+from core_logic.image_pipeline import content_hash, prepare_image, IMAGE_SETTINGS as DEFAULT_IMAGE_SETTINGS
+from core_logic.ocr import (OCR_SETTINGS, OCR_TEXT_PROMPT, OCR_REGIONS_PROMPT, ocr_available, read_images, ocr_text,
+                            low_confidence_regions, crop_regions)
+from core_logic.scoring import (SCORING_SYSTEM_PROMPT, parse_rubric, build_score_schema, build_scoring_instructions,
+                                build_repair_instructions, parse_score)
+from core_logic import metrics
+
+logger = logging.getLogger(__name__)
 
 # Folder where config files are stored
 CONFIG_FOLDER = "config_files"
@@ -222,10 +240,12 @@ def build_field(phase_name, fields, user_input, phases, system_prompt):
         ):
             user_input[field_key] = my_input_function(**kwargs)
 
-# Function to execute LLM completions
-def execute_llm_completions(SYSTEM_PROMPT,selected_llm, phase_instructions, user_prompt, image_urls=None):
+# Function to build the request context for an LLM completion
+def build_llm_context(SYSTEM_PROMPT, selected_llm, phase_instructions, user_prompt, image_urls=None, deadline=None,
+                      response_schema=None):
     """
-    Executes LLM completions using the selected model.
+    Builds the handler context for the selected model. Returns the model family and the context.
+    'response_schema' ({"name", "schema"}) asks the handler for JSON output using the provider's structured output.
     """
     if selected_llm not in LLM_CONFIG:
         raise ValueError(f"Selected model '{selected_llm}' not found in configuration.")
@@ -253,23 +273,191 @@ def execute_llm_completions(SYSTEM_PROMPT,selected_llm, phase_instructions, user
         "presence_penalty": model_config["presence_penalty"],
         "price_input_token_1M": model_config["price_input_token_1M"],
         "price_output_token_1M": model_config["price_output_token_1M"],
+        "price_cached_input_token_1M": model_config.get("price_cached_input_token_1M", model_config["price_input_token_1M"]),
+        "price_cache_write_token_1M": model_config.get("price_cache_write_token_1M", model_config["price_input_token_1M"]),
         "TOTAL_PRICE": 0,
         "chat_history": chat_history,
+        "deadline": deadline,
+        "retry_policy": RETRY_POLICY,
+        "response_schema": response_schema,
         "RAG_IMPLEMENTATION": RAG_IMPLEMENTATION if 'RAG_IMPLEMENTATION' in locals() else False,
         "file_path": "rag_docs/" + SOURCE_DOCUMENT if 'SOURCE_DOCUMENT' in locals() else None,
     }
+    return family, context
 
-    handler = HANDLERS.get(family)
-    if handler:
-        try:
-            result = handler(context)
-            return result
-        except Exception as e:
-            raise RuntimeError(f"Error in handling the LLM request: {e}")
-    else:
-        raise NotImplementedError(f"No handler implemented for model family '{family}'")
+# Function to estimate the tokens and price of an LLM completion before sending it
+def estimate_llm_completion(SYSTEM_PROMPT, selected_llm, phase_instructions, user_prompt, image_urls=None):
+    """
+    Estimates the input tokens and worst-case price of a request without sending it.
+    """
+    family, context = build_llm_context(SYSTEM_PROMPT, selected_llm, phase_instructions, user_prompt, image_urls)
+    return estimate_request(context, family)
+
+# Function to prepare the ordered fallback chain of LLM requests
+def prepare_llm_attempts(SYSTEM_PROMPT, selected_llm, phase_instructions, user_prompt, image_urls=None, deadline=None,
+                         on_wait=None, response_schema=None):
+    """
+    Builds one request per model in the fallback chain: the selected model first, then the app's LLM_FALLBACKS.
+    Each attempt's 'send' applies the REQUEST_BUDGET, waits for rate-limit capacity and calls the handler.
+    Must run in the script thread; the returned 'send' callables are safe to run from worker threads.
+    """
+    session_id = st.session_state["session_id"]
+    attempts = []
+    for model_name in [selected_llm] + [m for m in LLM_FALLBACKS if m != selected_llm and m in LLM_CONFIG]:
+        family, context = build_llm_context(SYSTEM_PROMPT, model_name, phase_instructions, user_prompt, image_urls,
+                                            deadline, response_schema)
+        handler = HANDLERS.get(family)
+        if not handler:
+            if model_name == selected_llm:
+                raise NotImplementedError(f"No handler implemented for model family '{family}'")
+            continue
+
+        def send(family=family, context=context, handler=handler):
+            estimate, budget_error = apply_request_budget(context, family, REQUEST_BUDGET)
+            if budget_error:
+                context["error"] = budget_error
+                return budget_error, 0
+            try:
+                acquire_capacity(family, session_id, estimate["input_tokens"] + estimate["output_tokens"], on_wait=on_wait,
+                                 timeout=context["deadline"] - time.monotonic() if context["deadline"] else None)
+            except TimeoutError as e:
+                context["error"] = e
+                return "The service is very busy right now. Please try again in a minute.", 0
+            try:
+                return handler(context)
+            except Exception as e:
+                raise RuntimeError(f"Error in handling the LLM request: {e}")
+
+        attempts.append({"name": model_name, "family": family, "context": context, "send": send})
+    return attempts
+
+# Function to execute LLM completions
+def execute_llm_completions(SYSTEM_PROMPT,selected_llm, phase_instructions, user_prompt, image_urls=None, deadline=None,
+                            response_schema=None):
+    """
+    Executes LLM completions using the selected model, falling back to the app's LLM_FALLBACKS if it fails.
+    With HEDGE_REQUESTS, a slow request also starts the next model and the first good answer wins.
+    Requests over the app's REQUEST_BUDGET are trimmed (oldest chat history first) or rejected before sending.
+    'deadline' is the monotonic time by which the request, including retries, must finish.
+    """
+    if deadline is None:
+        deadline = new_deadline(RETRY_POLICY)
+
+    # Show the rate-limit queue position while waiting; hedged requests wait in worker threads
+    queue_placeholder = st.empty()
+    script_ctx = get_script_run_ctx()
+    def show_queue_position(position, wait_seconds):
+        add_script_run_ctx(threading.current_thread(), script_ctx)
+        queue_placeholder.info(f"Many requests are in progress. You are number {position} in the queue "
+                               f"(about {max(1, int(wait_seconds))}s)...", icon="⏳")
+
+    attempts = prepare_llm_attempts(SYSTEM_PROMPT, selected_llm, phase_instructions, user_prompt, image_urls, deadline,
+                                    on_wait=show_queue_position, response_schema=response_schema)
+    result = route_completion(attempts, hedge=HEDGE_REQUESTS)
+    queue_placeholder.empty()
     return result
 
+# Function to execute one LLM completion per image (or small group of images)
+def execute_image_batch(SYSTEM_PROMPT, selected_llm, phase_instructions, user_prompt, image_urls, PHASE_DICT):
+    """
+    Sends each image group as an independent request, with bounded parallelism, and combines the
+    responses in upload order. Groups whose request failed are retried in up to 'batch_max_retries' extra rounds.
+    Returns the combined response and the total price.
+    """
+    group_size = PHASE_DICT.get("batch_group_size", BATCH_SETTINGS["group_size"])
+    max_workers = PHASE_DICT.get("batch_max_workers", BATCH_SETTINGS["max_workers"])
+    max_retries = PHASE_DICT.get("batch_max_retries", BATCH_SETTINGS["max_retries"])
+    groups = group_images(image_urls, group_size)
+    results = [None] * len(groups)
+    total_price = 0
+    completed = 0
+
+    progress = st.progress(0.0, text=f"Processing {len(image_urls)} images...")
+    pending = list(range(len(groups)))
+    for _ in range(max_retries + 1):
+        # Each group gets its own deadline when a worker starts it (see run_batch), so long batches are not cut short
+        attempts_by_index = {
+            index: prepare_llm_attempts(SYSTEM_PROMPT, selected_llm, phase_instructions, user_prompt, groups[index])
+            for index in pending
+        }
+        failed = []
+        for index, result, ok in run_batch(attempts_by_index, max_workers, HEDGE_REQUESTS, RETRY_POLICY):
+            results[index] = result
+            total_price += result[1]
+            if ok:
+                completed += 1
+            else:
+                failed.append(index)
+            progress.progress(completed / len(groups), text=f"Processed {completed} of {len(groups)} requests...")
+        pending = sorted(failed)
+        if not pending:
+            break
+        progress.progress(completed / len(groups), text=f"Retrying {len(pending)} failed requests...")
+    progress.empty()
+
+    return combine_results(results, groups), total_price
+
+# Function to read images with local OCR before involving a vision model
+def execute_ocr_prepass(SYSTEM_PROMPT, selected_llm, phase_instructions, user_prompt, uploads, PHASE_DICT):
+    """
+    Reads each uploaded image with local OCR first. Images read with high confidence are sent as text only
+    to the cheap 'ocr_refine_llm'; for the others, only the crops of low-confidence lines (or the whole image,
+    when there are too many) go to the selected vision model together with the OCR text.
+    Returns the combined response and the total price.
+    """
+    min_confidence = PHASE_DICT.get("ocr_min_confidence", OCR_SETTINGS["min_confidence"])
+    refine_llm = PHASE_DICT.get("ocr_refine_llm", OCR_SETTINGS["refine_llm"])
+    max_regions = PHASE_DICT.get("ocr_max_regions", OCR_SETTINGS["max_regions"])
+    language = PHASE_DICT.get("ocr_language", OCR_SETTINGS["language"])
+    max_workers = PHASE_DICT.get("batch_max_workers", BATCH_SETTINGS["max_workers"])
+    family = LLM_CONFIG[selected_llm]["family"]
+    image_settings = {**DEFAULT_IMAGE_SETTINGS, **IMAGE_SETTINGS}
+
+    def to_url(data, mime_type="image/png"):
+        return prepare_image(data, family, image_settings["format"], image_settings["quality"],
+                             fallback_mime_type=mime_type)
+
+    with st.spinner("Reading text from the images..."):
+        ocr_results = read_images([data for data, _ in uploads], language)
+
+    attempts_by_index = {}
+    modes = []
+    savings = []
+    for index, ((data, mime_type), result) in enumerate(zip(uploads, ocr_results)):
+        full_image = [to_url(data, mime_type)]
+        vision_estimate = estimate_llm_completion(SYSTEM_PROMPT, selected_llm, phase_instructions, user_prompt,
+                                                  full_image)
+        regions = low_confidence_regions(result, min_confidence) if result and result["lines"] else None
+
+        if regions == [] and refine_llm in LLM_CONFIG:
+            mode, model = "text", refine_llm
+            prompt = f"{user_prompt}\n\n{OCR_TEXT_PROMPT.format(text=ocr_text(result))}"
+            image_urls = None
+        elif regions and len(regions) <= max_regions:
+            mode, model = "regions", selected_llm
+            prompt = f"{user_prompt}\n\n{OCR_REGIONS_PROMPT.format(text=ocr_text(result, min_confidence))}"
+            image_urls = [to_url(crop) for crop in crop_regions(data, regions)]
+        else:
+            mode, model, prompt, image_urls = "vision", selected_llm, user_prompt, full_image
+
+        attempts_by_index[index] = prepare_llm_attempts(SYSTEM_PROMPT, model, phase_instructions, prompt, image_urls)
+        sent_estimate = estimate_llm_completion(SYSTEM_PROMPT, model, phase_instructions, prompt, image_urls)
+        modes.append(mode)
+        savings.append(max(0.0, vision_estimate["input_price"] - sent_estimate["input_price"]))
+
+    results = [None] * len(uploads)
+    total_price = 0
+    for index, result, ok in run_batch(attempts_by_index, max_workers, HEDGE_REQUESTS, RETRY_POLICY):
+        results[index] = result
+        total_price += result[1]
+        metrics.increment("ocr_images", mode=modes[index])
+        if ok and modes[index] != "vision":
+            metrics.increment("ocr_cost_saved", savings[index])
+
+    if len(results) == 1:
+        return results[0]
+    return combine_results(results, [[upload] for upload in uploads]), total_price
+
 # Function to apply conditional logic to prompts
 def prompt_conditionals(user_input, phase_name=None, phases=None):
     """
@@ -349,28 +537,29 @@ def st_store(input, phase_name, phase_key, field_key=""):
         key = f"{phase_name}_{phase_key}"
     st.session_state[key] = input
 
-# Function to build scoring instructions
-def build_scoring_instructions(rubric):
+# Function to score a response against the phase rubric
+def execute_rubric_scoring(selected_llm, rubric, user_prompt, deadline=None):
     """
-    Builds scoring instructions based on the provided rubric for AI scoring.
+    Scores the user's response with the provider's structured JSON output, validated against a schema
+    generated from the rubric. An invalid response gets one automatic repair round.
+    Returns the raw response, the validated score ({"scores": {...}, "total": n} or None) and the total price.
     """
-    scoring_instructions = f"""
-        Please score the user's previous response based on the following rubric: \n{rubric}
-        \n\nPlease output your response as JSON, using this format: '{{{{ "[criteria 1]": "[score 1]", "[criteria 2]": "[score 2]", "total": "[total score]" }}}}'
-        """
-    return scoring_instructions
-
-# Function to extract score from AI response
-def extract_score(text):
-    """
-    Extracts the total score from the AI response text.
-    """
-    pattern = r'"total":\s*"?(\d+)"?'
-    match = re.search(pattern, text)
-    if match:
-        return int(match.group(1))
-    else:
-        return 0
+    criteria = parse_rubric(rubric)
+    response_schema = {"name": "rubric_score", "schema": build_score_schema(criteria)}
+    scoring_instructions = build_scoring_instructions(rubric, criteria)
+    ai_score, price = execute_llm_completions(SCORING_SYSTEM_PROMPT, selected_llm, scoring_instructions, user_prompt,
+                                              deadline=deadline, response_schema=response_schema)
+    score, errors = parse_score(ai_score, response_schema["schema"])
+    if errors:
+        metrics.increment("scoring_repairs")
+        repair_instructions = build_repair_instructions(scoring_instructions, ai_score, errors)
+        ai_score, repair_price = execute_llm_completions(SCORING_SYSTEM_PROMPT, selected_llm, repair_instructions,
+                                                         user_prompt, deadline=deadline, response_schema=response_schema)
+        price += repair_price
+        score, errors = parse_score(ai_score, response_schema["schema"])
+        if errors:
+            metrics.increment("scoring_failures")
+    return ai_score, score, price
 
 # Function to check if the score meets the minimum requirement
 def check_score(PHASES,PHASE_NAME):
@@ -416,30 +605,49 @@ def celebration():
     )
 
 # Function to find image URLs for uploaded app_images
-def find_image_urls(user_input,fields):
+def find_image_urls(user_input,fields, selected_llm=None):
     """
     Extracts and encodes image URLs from file uploads in the form fields.
+    Uploads are downscaled and re-encoded for the selected model (cached by content hash),
+    and an image uploaded more than once is only sent once.
     """
-    image_urls = []
+    family = LLM_CONFIG.get(selected_llm, {}).get("family", "openai")
+    image_settings = {**DEFAULT_IMAGE_SETTINGS, **IMAGE_SETTINGS}
+    image_urls = [value['image'] for value in fields.values()
+                  if 'image' in value and not value.get('decorative')]
+    for file_content, mime_type in find_uploaded_images(user_input, fields):
+        image_url = prepare_image(file_content, family, image_settings["format"],
+                                  image_settings["quality"], fallback_mime_type=mime_type)
+        image_urls.append(image_url)
+    return image_urls
+
+def find_uploaded_images(user_input, fields):
+    """
+    Returns (bytes, mime_type) for each distinct file uploaded in the form fields, in upload order.
+    Duplicates are dropped within one submission only: the chat history replays text but not images,
+    so an image sent on an earlier turn must be sent again for the model to see it.
+    """
+    seen_hashes = set()
+    uploads = []
     for key, value in fields.items():
         if 'decorative' in value and value['decorative']:
             continue
-        if 'image' in value:
-            image_urls.append(value['image'])
         if 'file_uploader' in value.values():
             uploaded_files = user_input[key]
             if not isinstance(uploaded_files, list):
                 uploaded_files = [uploaded_files]
             for uploaded_file in uploaded_files:
                 if uploaded_file:
-                    file_content = uploaded_file.read()
+                    file_content = uploaded_file.getvalue()
+                    file_hash = content_hash(file_content)
+                    if file_hash in seen_hashes:
+                        continue
+                    seen_hashes.add(file_hash)
                     mime_type, _ = mimetypes.guess_type(uploaded_file.name)
                     if not mime_type:
                         mime_type = 'application/octet-stream'
-                    base64_encoded_content = base64.b64encode(file_content).decode('utf-8')
-                    image_url = f"data:{mime_type};base64,{base64_encoded_content}"
-                    image_urls.append(image_url)
-    return image_urls
+                    uploads.append((file_content, mime_type))
+    return uploads
 
 def handle_chat_history(user_input, ai_response, phase_instructions = None,image_urls = None):
     """
@@ -562,27 +770,32 @@ def handle_submission(PHASE_NAME, PHASE_DICT, fields, user_input, formatted_user
         st_store(user_input.get(field_key, ""), PHASE_NAME, "user_input", field_key)
 
     phase_instructions = PHASE_DICT.get("phase_instructions", "")
-    image_urls = find_image_urls(user_input, PHASE_DICT.get('fields', {}))
+    image_urls = find_image_urls(user_input, PHASE_DICT.get('fields', {}), selected_llm)
+    # One deadline covers every LLM call made for this submission, retries included
+    deadline = new_deadline(RETRY_POLICY)
 
     if PHASE_DICT.get("ai_response", True):
         if PHASE_DICT.get("scored_phase", False):
             if "rubric" in PHASE_DICT:
                 # First, provide feedback on the user's response
-                ai_feedback, execution_price = execute_llm_completions(SYSTEM_PROMPT, selected_llm, phase_instructions, formatted_user_prompt, image_urls)
+                ai_feedback, execution_price = execute_llm_completions(SYSTEM_PROMPT, selected_llm, phase_instructions, formatted_user_prompt, image_urls, deadline)
                 st.session_state['TOTAL_PRICE'] += execution_price
                 st.info(body=ai_feedback, icon="🤖")
                 
                 # Second, provide a score based on the rubric
-                scoring_instructions = build_scoring_instructions(PHASE_DICT["rubric"])
-                ai_score, score_price = execute_llm_completions("You review the previous conversation and provide a score based on a rubric. You always provide your output in JSON format.", selected_llm, scoring_instructions, formatted_user_prompt)
+                ai_score, structured_score, score_price = execute_rubric_scoring(selected_llm, PHASE_DICT["rubric"], formatted_user_prompt, deadline)
                 st.session_state['TOTAL_PRICE'] += score_price
                 st.info(ai_score, icon="🤖")
                 
                 # Store the feedback and score
                 st_store(ai_feedback, PHASE_NAME, "ai_response")
                 st_store(ai_score, PHASE_NAME, "ai_score_debug")
-                score = extract_score(ai_score)
+                if structured_score is None:
+                    st_store("Your response could not be scored. Please try again.", PHASE_NAME, "error_message")
+                    return False
+                score = structured_score["total"]
                 st_store(score, PHASE_NAME, "ai_score")
+                st_store(structured_score.get("scores", {}), PHASE_NAME, "ai_criteria_scores")
 
                 # Add to chat history
                 handle_chat_history(formatted_user_prompt, ai_feedback, phase_instructions, image_urls)
@@ -605,7 +818,13 @@ def handle_submission(PHASE_NAME, PHASE_DICT, fields, user_input, formatted_user
                 st_store("You need to include a rubric for a scored phase", PHASE_NAME, "error_message")
                 return False
         else:
-            ai_feedback, execution_price = execute_llm_completions(SYSTEM_PROMPT, selected_llm, phase_instructions, formatted_user_prompt, image_urls)
+            uploads = find_uploaded_images(user_input, PHASE_DICT.get('fields', {}))
+            if PHASE_DICT.get("ocr_prepass", False) and uploads and len(uploads) == len(image_urls) and ocr_available():
+                ai_feedback, execution_price = execute_ocr_prepass(SYSTEM_PROMPT, selected_llm, phase_instructions, formatted_user_prompt, uploads, PHASE_DICT)
+            elif PHASE_DICT.get("batch_images", False) and len(image_urls) > 1:
+                ai_feedback, execution_price = execute_image_batch(SYSTEM_PROMPT, selected_llm, phase_instructions, formatted_user_prompt, image_urls, PHASE_DICT)
+            else:
+                ai_feedback, execution_price = execute_llm_completions(SYSTEM_PROMPT, selected_llm, phase_instructions, formatted_user_prompt, image_urls, deadline)
             st_store(ai_feedback, PHASE_NAME, "ai_response")
             st.session_state['TOTAL_PRICE'] += execution_price
             
@@ -643,6 +862,7 @@ def main(config):
     PAGE_CONFIG = config.get('PAGE_CONFIG',{})
     SIDEBAR_HIDDEN = config.get('SIDEBAR_HIDDEN', True)
     DISPLAY_COST = config.get('DISPLAY_COST', False)
+    DISPLAY_METRICS = config.get('DISPLAY_METRICS', False)
     APP_TITLE = config.get('APP_TITLE',"Default Title")
     APP_INTRO = config.get('APP_INTRO', "")
     APP_HOW_IT_WORKS = config.get('APP_HOW_IT_WORKS',"")
@@ -654,6 +874,16 @@ def main(config):
     LLM_CONFIGURATIONS = LLM_CONFIG
     global LLM_CONFIG_OVERRIDE
     LLM_CONFIG_OVERRIDE = config.get('LLM_CONFIG_OVERRIDE', {})
+    global REQUEST_BUDGET
+    REQUEST_BUDGET = config.get('REQUEST_BUDGET', {})
+    global RETRY_POLICY
+    RETRY_POLICY = config.get('RETRY_POLICY', {})
+    global LLM_FALLBACKS
+    LLM_FALLBACKS = config.get('LLM_FALLBACKS', [])
+    global HEDGE_REQUESTS
+    HEDGE_REQUESTS = config.get('HEDGE_REQUESTS', False)
+    global IMAGE_SETTINGS
+    IMAGE_SETTINGS = config.get('IMAGE_SETTINGS', {})
     PREFERRED_LLM = config.get('PREFERRED_LLM', 'openai')
     SYSTEM_PROMPT = config.get('SYSTEM_PROMPT', '')
 
@@ -700,6 +930,9 @@ def main(config):
     image_urls = []
     if 'TOTAL_PRICE' not in st.session_state:
         st.session_state['TOTAL_PRICE'] = 0
+    # Identifies this browser session for fair queuing in the shared rate limiter
+    if 'session_id' not in st.session_state:
+        st.session_state['session_id'] = uuid.uuid4().hex
 
     # Handle sidebar and model selection
     with st.sidebar:
@@ -735,6 +968,11 @@ def main(config):
         if DISPLAY_COST:
             st.write("Price: ${:.6f}".format(st.session_state['TOTAL_PRICE']))
 
+        # Process-wide request metrics: retries, rate-limit waits, fallbacks, batch and OCR results
+        if DISPLAY_METRICS:
+            with st.expander("Request metrics"):
+                st.json(metrics.snapshot())
+
         # Display chat history in the sidebar
         st.subheader("Chat History")
         for history in st.session_state['chat_history']:
@@ -823,6 +1061,13 @@ def main(config):
                            for field in PHASE_DICT['fields'].values())
 
         if not st.session_state.get(f"{PHASE_NAME}_phase_completed", False):
+            # Show the pre-flight estimate of what this submission will cost
+            if DISPLAY_COST and PHASE_DICT.get("ai_response", True):
+                estimate = estimate_llm_completion(SYSTEM_PROMPT, selected_llm, PHASE_DICT.get("phase_instructions", ""),
+                                                   formatted_user_prompt, find_image_urls(user_input, fields, selected_llm))
+                st.caption("Estimated request: ~{} input tokens, up to ${:.6f}".format(estimate["input_tokens"],
+                                                                                       estimate["price"]))
+
             # Use bottom container for chat input phases, regular container otherwise
             container_class = _bottom.container() if has_chat_input else st.container()
             default_button_label = "End Chat" if has_chat_input else "Submit"
@@ -863,6 +1108,7 @@ def main(config):
 
         if submit_button:
             handle_submission(PHASE_NAME, PHASE_DICT, fields, user_input, formatted_user_prompt, selected_llm, SYSTEM_PROMPT, PHASES)
+            logger.info("Request metrics after %s: %s", PHASE_NAME, json.dumps(metrics.snapshot(), sort_keys=True))
             st.rerun()
 
         if PHASE_DICT.get("allow_revisions", False):
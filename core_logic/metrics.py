@@ -0,0 +1,67 @@
+import threading
+from collections import defaultdict, deque
+
+# Number of recent observations kept per metric for percentiles
+MAX_OBSERVATIONS = 1000
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_observations = defaultdict(lambda: deque(maxlen=MAX_OBSERVATIONS))
+
+
+def _metric_key(name, labels):
+    """Build a hashable key from a metric name and its labels."""
+    return name, tuple(sorted(labels.items()))
+
+
+def increment(name, value=1, **labels):
+    """Add 'value' to a process-wide counter."""
+    with _lock:
+        _counters[_metric_key(name, labels)] += value
+
+
+def observe(name, value, **labels):
+    """Record one observation (e.g. a latency in seconds) for a metric."""
+    with _lock:
+        _observations[_metric_key(name, labels)].append(value)
+
+
+def get_observations(name, **labels):
+    """Return the recent observations recorded for a metric."""
+    with _lock:
+        return list(_observations.get(_metric_key(name, labels), ()))
+
+
+def percentile(name, q, **labels):
+    """Return the q-th percentile (0-100) of a metric's recent observations, or None if there are none."""
+    values = sorted(get_observations(name, **labels))
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def snapshot():
+    """Return all counters and observation summaries, keyed by 'name{label=value,...}'."""
+    def format_key(key):
+        name, labels = key
+        if not labels:
+            return name
+        return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+    with _lock:
+        counters = {format_key(key): value for key, value in _counters.items()}
+        observations = {key: list(values) for key, values in _observations.items()}
+
+    summaries = {}
+    for key, values in observations.items():
+        if values:
+            ordered = sorted(values)
+            summaries[format_key(key)] = {
+                "count": len(ordered),
+                "mean": sum(ordered) / len(ordered),
+                "p50": ordered[len(ordered) // 2],
+                "p95": ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+                "max": ordered[-1],
+            }
+    return {"counters": counters, "observations": summaries}
@@ -0,0 +1,174 @@
+import io
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image, ImageOps, UnidentifiedImageError
+from core_logic import metrics
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+# Defaults for phases with "ocr_prepass": True. Override per phase with
+# "ocr_min_confidence", "ocr_refine_llm", "ocr_max_regions" and "ocr_language".
+OCR_SETTINGS = {
+    "min_confidence": 80,          # word confidence (0-100) below which a line is re-read by the vision model
+    "refine_llm": "gpt-4o-mini",   # text-only model that tidies OCR output read with high confidence
+    "max_regions": 4,              # with more uncertain lines than this, the whole image is sent instead
+    "region_padding": 8,           # pixels added around each uncertain line before cropping
+    "language": "eng",
+    "max_workers": 2,              # OCR processes shared by every session
+    "timeout": 30.0,               # seconds tesseract may spend on one image before it is killed
+}
+
+# Appended to the user prompt when the OCR text is good enough to use on its own
+OCR_TEXT_PROMPT = """The image has already been read with OCR. Use the OCR text below in place of the image: \
+correct obvious recognition errors, keep the original wording and line breaks, and do not invent text.
+
+OCR text:
+{text}"""
+
+# Appended to the user prompt when only some lines need the vision model
+OCR_REGIONS_PROMPT = """The image has already been read with OCR. Lines marked [?] were read with low \
+confidence; the attached images are crops of those lines, in the same order. Use the crops to correct \
+the marked lines and return the complete result for the whole image.
+
+OCR text:
+{text}"""
+
+_pool = None
+_pool_lock = threading.Lock()
+_available = None
+
+
+def ocr_available():
+    """Return True if pytesseract and the tesseract binary are both installed."""
+    global _available
+    if _available is None:
+        try:
+            _available = pytesseract is not None and bool(pytesseract.get_tesseract_version())
+        except (pytesseract.TesseractNotFoundError, OSError):
+            _available = False
+    return _available
+
+
+def _get_pool(max_workers):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max_workers)
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _open_image(data):
+    return ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+
+
+def _read_image(data, language, timeout):
+    """
+    Run tesseract on one image (in a worker process) and group its words into lines.
+    pytesseract kills tesseract after 'timeout' seconds and raises RuntimeError, so a hung read
+    cannot hold on to a pool worker.
+    Returns {"lines": [{"text", "confidence", "box", "paragraph"}], "seconds"}.
+    """
+    started = time.monotonic()
+    image = _open_image(data).convert("L")
+    words = pytesseract.image_to_data(image, lang=language, output_type=pytesseract.Output.DICT, timeout=timeout)
+
+    lines = {}
+    for i, word in enumerate(words["text"]):
+        word = word.strip()
+        confidence = float(words["conf"][i])
+        if not word or confidence < 0:
+            continue
+        left, top = words["left"][i], words["top"][i]
+        right, bottom = left + words["width"][i], top + words["height"][i]
+        key = (words["block_num"][i], words["par_num"][i], words["line_num"][i])
+        if key not in lines:
+            lines[key] = {"words": [], "confidence": 100.0, "box": [left, top, right, bottom]}
+        line = lines[key]
+        line["words"].append(word)
+        # A line is only as reliable as its weakest word
+        line["confidence"] = min(line["confidence"], confidence)
+        line["box"] = [min(line["box"][0], left), min(line["box"][1], top),
+                       max(line["box"][2], right), max(line["box"][3], bottom)]
+
+    return {
+        "lines": [{"text": " ".join(line["words"]), "confidence": line["confidence"],
+                   "box": tuple(line["box"]), "paragraph": key[:2]}
+                  for key, line in sorted(lines.items())],
+        "seconds": time.monotonic() - started,
+    }
+
+
+def read_images(images, language=None, max_workers=None, timeout=None):
+    """
+    OCR each image's bytes in the process pool. Returns one result per image (see _read_image),
+    or None for images that could not be read in time.
+    """
+    language = language or OCR_SETTINGS["language"]
+    timeout = timeout or OCR_SETTINGS["timeout"]
+    pool = _get_pool(max_workers or OCR_SETTINGS["max_workers"])
+    futures = [pool.submit(_read_image, data, language, timeout) for data in images]
+
+    results = []
+    for future in futures:
+        try:
+            # Tesseract enforces 'timeout' itself; this wait only guards against a worker that never answers
+            result = future.result(timeout=2 * timeout)
+            metrics.observe("ocr_seconds", result["seconds"])
+        except BrokenProcessPool:
+            _reset_pool()
+            result = None
+        except (FutureTimeoutError, RuntimeError, UnidentifiedImageError, pytesseract.TesseractError, OSError,
+                ValueError):
+            future.cancel()
+            result = None
+        if result is None:
+            metrics.increment("ocr_failures")
+        results.append(result)
+    return results
+
+
+def ocr_text(result, min_confidence=None):
+    """Return the OCR text with paragraphs separated by blank lines. Uncertain lines are prefixed with [?]."""
+    paragraphs = []
+    previous = None
+    for line in result["lines"]:
+        text = line["text"]
+        if min_confidence is not None and line["confidence"] < min_confidence:
+            text = f"[?] {text}"
+        if line["paragraph"] != previous:
+            paragraphs.append([])
+            previous = line["paragraph"]
+        paragraphs[-1].append(text)
+    return "\n\n".join("\n".join(lines) for lines in paragraphs)
+
+
+def low_confidence_regions(result, min_confidence):
+    """Return the bounding boxes of lines read with less than 'min_confidence'."""
+    return [line["box"] for line in result["lines"] if line["confidence"] < min_confidence]
+
+
+def crop_regions(data, boxes, padding=None):
+    """Crop each (left, top, right, bottom) box, plus padding, out of the image. Returns PNG bytes per box."""
+    padding = OCR_SETTINGS["region_padding"] if padding is None else padding
+    image = _open_image(data)
+    crops = []
+    for left, top, right, bottom in boxes:
+        crop = image.crop((max(0, left - padding), max(0, top - padding),
+                           min(image.width, right + padding), min(image.height, bottom + padding)))
+        buffer = io.BytesIO()
+        crop.save(buffer, format="PNG")
+        crops.append(buffer.getvalue())
+    return crops
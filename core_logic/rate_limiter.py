@@ -0,0 +1,152 @@
+import hashlib
+import itertools
+import os
+import threading
+import time
+from core_logic import metrics
+
+# Default limits per API key service (the values of API_KEY_SERVICES). Override with e.g. OPENAI_RPM /
+# OPENAI_TPM environment variables to match the tier of the deployed API key. A limit of None disables
+# that bucket.
+RATE_LIMITS = {
+    "openai": {"requests_per_minute": 500, "tokens_per_minute": 30000},
+    "claude": {"requests_per_minute": 50, "tokens_per_minute": 40000},
+    "google": {"requests_per_minute": 360, "tokens_per_minute": 4000000},
+    "perplexity": {"requests_per_minute": 50, "tokens_per_minute": None},
+}
+
+# The environment API key each model family uses (see handlers.get_api_key)
+API_KEY_SERVICES = {
+    "openai": "openai",
+    "rag": "openai",
+    "claude": "claude",
+    "gemini": "google",
+    "perplexity": "perplexity",
+}
+
+# Every model family must reach a service with at least one bounded bucket, or its requests are never limited
+for _family, _service in API_KEY_SERVICES.items():
+    if not any(RATE_LIMITS.get(_service, {}).values()):
+        raise RuntimeError(f"No rate limit configured for the '{_service}' service used by '{_family}' models.")
+
+# How often waiting requests re-check the buckets and report their queue position
+POLL_INTERVAL_SECONDS = 1.0
+
+
+class TokenBucket:
+    """A token bucket that refills continuously up to 'capacity' per minute."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.refill_per_second = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until 'amount' can be taken (0 if it is available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.refill_per_second
+
+    def take(self, amount):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+
+class ProviderLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limiter for one provider API key.
+    Waiting requests are served round-robin across sessions, so one session submitting
+    repeatedly cannot starve the others.
+    """
+
+    def __init__(self, name, requests_per_minute=None, tokens_per_minute=None):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.condition = threading.Condition()
+        self.waiters = []
+        self.sequence = itertools.count()
+
+    def _wait_time(self, tokens):
+        waits = [0.0]
+        if self.requests:
+            waits.append(self.requests.wait_time(1))
+        if self.tokens:
+            waits.append(self.tokens.wait_time(tokens))
+        return max(waits)
+
+    def acquire(self, session_id, tokens, on_wait=None, timeout=None):
+        """
+        Block until the request may be sent. 'on_wait(position, wait_seconds)' is called while
+        queued. Raises TimeoutError if 'timeout' seconds pass first. Returns the seconds waited.
+        """
+        started = time.monotonic()
+        with self.condition:
+            # A session's n-th pending request is queued behind every other session's n-th request
+            session_round = sum(1 for waiter in self.waiters if waiter[2] == session_id)
+            ticket = (session_round, next(self.sequence), session_id)
+            self.waiters.append(ticket)
+
+        try:
+            while True:
+                with self.condition:
+                    position = sorted(self.waiters).index(ticket)
+                    wait = self._wait_time(tokens) if position == 0 else POLL_INTERVAL_SECONDS
+                    if position == 0 and wait <= 0:
+                        if self.requests:
+                            self.requests.take(1)
+                        if self.tokens:
+                            self.tokens.take(tokens)
+                        break
+
+                elapsed = time.monotonic() - started
+                if timeout is not None and elapsed >= timeout:
+                    metrics.increment("rate_limit_timeouts", provider=self.name)
+                    raise TimeoutError(f"Timed out after {elapsed:.1f}s waiting for {self.name} capacity.")
+                if on_wait:
+                    on_wait(position + 1, wait)
+
+                with self.condition:
+                    self.condition.wait(timeout=min(wait, POLL_INTERVAL_SECONDS))
+        finally:
+            with self.condition:
+                self.waiters.remove(ticket)
+                self.condition.notify_all()
+
+        waited = time.monotonic() - started
+        metrics.observe("rate_limit_wait_seconds", waited, provider=self.name)
+        if waited > POLL_INTERVAL_SECONDS / 10:
+            metrics.increment("rate_limited_requests", provider=self.name)
+        return waited
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(family):
+    """Return the process-wide limiter for a model family and its configured API key."""
+    service = API_KEY_SERVICES.get(family, family)
+    api_key = os.getenv(f"{service.upper()}_API_KEY", "")
+    key = (service, hashlib.sha256(api_key.encode()).hexdigest()[:12])
+
+    with _limiters_lock:
+        if key not in _limiters:
+            limits = RATE_LIMITS.get(service, {})
+            rpm = os.getenv(f"{service.upper()}_RPM", limits.get("requests_per_minute"))
+            tpm = os.getenv(f"{service.upper()}_TPM", limits.get("tokens_per_minute"))
+            _limiters[key] = ProviderLimiter(service, int(rpm) if rpm else None, int(tpm) if tpm else None)
+        return _limiters[key]
+
+
+def acquire_capacity(family, session_id, tokens, on_wait=None, timeout=None):
+    """Wait for rate-limit capacity to send a request of 'tokens' (prompt + max output) to a provider."""
+    return get_limiter(family).acquire(session_id, tokens, on_wait=on_wait, timeout=timeout)
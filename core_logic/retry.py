@@ -0,0 +1,127 @@
+import email.utils
+import random
+import time
+import anthropic
+import openai
+import requests
+from core_logic import metrics
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:
+    google_exceptions = None
+
+# Default retry and timeout policy for every LLM handler. Apps can override any key with RETRY_POLICY.
+RETRY_POLICY = {
+    "max_attempts": 4,        # first try plus up to three retries
+    "base_delay": 1.0,        # seconds before the first retry, doubled on every attempt
+    "max_delay": 20.0,        # cap on a single backoff delay
+    "call_timeout": 60.0,     # timeout of a single provider call
+    "total_timeout": 180.0,   # deadline for everything sent by one phase submission
+}
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server errors and Anthropic's "overloaded"
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+RETRYABLE_EXCEPTIONS = (
+    openai.APIConnectionError,  # includes openai.APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+    anthropic.APIConnectionError,  # includes anthropic.APITimeoutError
+    anthropic.RateLimitError,
+    anthropic.InternalServerError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    TimeoutError,
+)
+if google_exceptions is not None:
+    RETRYABLE_EXCEPTIONS += (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.DeadlineExceeded,
+    )
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request's total deadline runs out before it could succeed."""
+
+
+def new_deadline(policy=None):
+    """Return the monotonic deadline for one phase submission."""
+    policy = {**RETRY_POLICY, **(policy or {})}
+    return time.monotonic() + policy["total_timeout"]
+
+
+def get_status_code(error):
+    """Return the HTTP status code carried by a provider exception, if any."""
+    status = getattr(error, "status_code", None)
+    if status is None and getattr(error, "response", None) is not None:
+        status = getattr(error.response, "status_code", None)
+    if status is None:
+        status = getattr(error, "code", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error):
+    """Classify an exception as transient (worth retrying) or permanent."""
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if isinstance(error, RETRYABLE_EXCEPTIONS):
+        return True
+    return get_status_code(error) in RETRYABLE_STATUS_CODES
+
+
+def get_retry_after(error):
+    """Return the server-requested delay in seconds from Retry-After headers, if present."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                retry_at = email.utils.parsedate_to_datetime(retry_after)
+                return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def call_with_retry(call, family, deadline=None, policy=None, cancel_event=None):
+    """
+    Call 'call(timeout)' until it succeeds, retrying transient errors with exponential backoff
+    and full jitter. 'timeout' is the per-call budget, shortened to fit the overall 'deadline'.
+    Permanent errors, exhausted attempts and missed deadlines re-raise the last exception.
+    No further retries are made once 'cancel_event' (a threading.Event) is set.
+    """
+    policy = {**RETRY_POLICY, **(policy or {})}
+    if deadline is None:
+        deadline = time.monotonic() + policy["total_timeout"]
+
+    attempt = 1
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            metrics.increment("llm_deadline_exceeded", provider=family)
+            raise DeadlineExceeded(f"{family} request deadline exceeded.")
+        try:
+            return call(min(policy["call_timeout"], remaining))
+        except Exception as error:
+            if not is_retryable(error) or attempt >= policy["max_attempts"]:
+                raise
+            if cancel_event is not None and cancel_event.is_set():
+                raise
+            backoff = random.uniform(0, min(policy["max_delay"], policy["base_delay"] * 2 ** (attempt - 1)))
+            delay = max(backoff, get_retry_after(error) or 0)
+            if time.monotonic() + delay >= deadline:
+                raise
+            metrics.increment("llm_retries", provider=family, error=type(error).__name__)
+            time.sleep(delay)
+            attempt += 1
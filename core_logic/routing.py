@@ -0,0 +1,114 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from core_logic import metrics
+
+# Latency of successful calls per provider; drives the hedging delay
+LATENCY_METRIC = "llm_latency_seconds"
+# Percentile of recent latency after which a hedged request is started
+HEDGE_PERCENTILE = 95
+# Below this many samples the default delay is used
+HEDGE_MIN_SAMPLES = 20
+DEFAULT_HEDGE_DELAY_SECONDS = 15.0
+
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-route")
+
+
+def hedge_delay(family):
+    """Return how long to wait for 'family' before hedging: its recent p95 latency."""
+    if len(metrics.get_observations(LATENCY_METRIC, provider=family)) < HEDGE_MIN_SAMPLES:
+        return DEFAULT_HEDGE_DELAY_SECONDS
+    return metrics.percentile(LATENCY_METRIC, HEDGE_PERCENTILE, provider=family)
+
+
+def _run_attempt(attempt):
+    """Send one attempt and record its latency. Returns (result, error)."""
+    started = time.monotonic()
+    result = attempt["send"]()
+    attempt["context"]["completed"] = True
+    error = attempt["context"].get("error")
+    if error is None:
+        metrics.observe(LATENCY_METRIC, time.monotonic() - started, provider=attempt["family"])
+    else:
+        metrics.increment("llm_failures", provider=attempt["family"])
+    return result, error
+
+
+def _record_abandoned_price(future, family):
+    """Done-callback for a hedged attempt that lost: the provider still bills it, so record its price."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    result, _ = future.result()
+    price = result[1] if isinstance(result, tuple) and len(result) > 1 else 0
+    if price:
+        metrics.increment("llm_hedge_wasted_price", price, provider=family)
+
+
+def succeeded(attempts):
+    """Return True if any attempt of a routed request completed without an error."""
+    return any(attempt["context"].get("completed") and attempt["context"].get("error") is None
+               for attempt in attempts)
+
+
+def route_completion(attempts, hedge=False):
+    """
+    Send a request down an ordered fallback chain and return the first good (response, price).
+
+    'attempts' is a list of dicts with 'name', 'family', 'context' and 'send' (a callable that
+    performs the request and sets context["error"] on failure). Without hedging each attempt
+    runs after the previous one failed. With hedging, the next attempt also starts once the
+    running one is slower than its provider's p95 latency; the first good answer wins and the
+    others are cancelled. Losing calls that still complete are billed by the provider, so their
+    price is recorded as 'llm_hedge_wasted_price'. If every attempt fails, the last failure is returned.
+    """
+    if not hedge:
+        result = None
+        for index, attempt in enumerate(attempts):
+            result, error = _run_attempt(attempt)
+            if error is None:
+                if index > 0:
+                    metrics.increment("llm_fallbacks", provider=attempt["family"])
+                return result
+        return result
+
+    pending = {}
+    remaining = list(attempts)
+    last_result = None
+
+    def start_next():
+        attempt = remaining.pop(0)
+        attempt["context"]["cancel_event"] = threading.Event()
+        pending[_executor.submit(_run_attempt, attempt)] = attempt
+        return attempt
+
+    current = start_next()
+    while pending:
+        timeout = hedge_delay(current["family"]) if remaining else None
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+        if not done:
+            # The running request is slower than usual: hedge with the next provider
+            current = start_next()
+            metrics.increment("llm_hedged_requests", provider=current["family"])
+            continue
+
+        for future in done:
+            attempt = pending.pop(future)
+            result, error = future.result()
+            if error is None:
+                for other_future, other in pending.items():
+                    other["context"]["cancel_event"].set()
+                    if not other_future.cancel():
+                        other_future.add_done_callback(
+                            lambda f, family=other["family"]: _record_abandoned_price(f, family))
+                    metrics.increment("llm_hedges_cancelled", provider=other["family"])
+                if attempt is not attempts[0]:
+                    metrics.increment("llm_fallbacks", provider=attempt["family"])
+                return result
+            last_result = result
+
+        # A failure frees the slot for the next provider straight away
+        if remaining and len(pending) < 2:
+            current = start_next()
+
+    return last_result
@@ -0,0 +1,143 @@
+import json
+import re
+
+SCORING_SYSTEM_PROMPT = ("You review the previous conversation and provide a score based on a rubric. "
+                         "You always provide your output in JSON format.")
+
+# A numbered rubric criterion, e.g. "1. Comprehensiveness"
+CRITERION_PATTERN = re.compile(r"^\s*(\d+)[.)]\s+(.+?)\s*$")
+# A score level within a criterion, e.g. "3 points - Mentions at least three key findings"
+POINTS_PATTERN = re.compile(r"\b(\d+)\s*(?:points?|pts?)\b", re.IGNORECASE)
+
+
+def _criterion_key(name, used):
+    """Turn a criterion name into a JSON property name that every provider accepts."""
+    base = re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")[:48] or "criterion"
+    key, n = base, 2
+    while key in used:
+        key, n = f"{base}_{n}", n + 1
+    used.add(key)
+    return key
+
+
+def parse_rubric(rubric):
+    """
+    Find the numbered criteria of a rubric and the highest points listed under each.
+    Returns a list of {"key", "name", "max_points"}; max_points is None when no points are listed.
+    Free-form rubrics without numbered criteria return an empty list.
+    """
+    criteria = []
+    used = set()
+    for line in rubric.splitlines():
+        match = CRITERION_PATTERN.match(line)
+        if match and not POINTS_PATTERN.match(match.group(2)):
+            name = match.group(2).rstrip(":")
+            criteria.append({"key": _criterion_key(name, used), "name": name, "max_points": None})
+            continue
+        points = POINTS_PATTERN.search(line)
+        if points and criteria:
+            current = criteria[-1]["max_points"]
+            criteria[-1]["max_points"] = max(current or 0, int(points.group(1)))
+    return criteria
+
+
+def build_score_schema(criteria):
+    """Build the JSON schema of a score: one integer per criterion plus the total."""
+    total = {"type": "integer", "minimum": 0}
+    if criteria and all(criterion["max_points"] is not None for criterion in criteria):
+        total["maximum"] = sum(criterion["max_points"] for criterion in criteria)
+    if not criteria:
+        return {"type": "object", "properties": {"total": total}, "required": ["total"],
+                "additionalProperties": False}
+
+    scores = {}
+    for criterion in criteria:
+        scores[criterion["key"]] = {"type": "integer", "minimum": 0, "description": criterion["name"]}
+        if criterion["max_points"] is not None:
+            scores[criterion["key"]]["maximum"] = criterion["max_points"]
+    return {
+        "type": "object",
+        "properties": {
+            "scores": {"type": "object", "properties": scores, "required": list(scores),
+                       "additionalProperties": False},
+            "total": total,
+        },
+        "required": ["scores", "total"],
+        "additionalProperties": False,
+    }
+
+
+def validate(data, schema, path="$"):
+    """
+    Check 'data' against the subset of JSON schema used for scores (object, integer, string, number,
+    properties, required, additionalProperties, minimum, maximum). Returns a list of error messages.
+    """
+    expected = schema.get("type")
+    if expected == "object":
+        if not isinstance(data, dict):
+            return [f"{path} must be an object"]
+        errors = [f"{path}.{key} is missing" for key in schema.get("required", []) if key not in data]
+        properties = schema.get("properties", {})
+        for key, value in data.items():
+            if key in properties:
+                errors.extend(validate(value, properties[key], f"{path}.{key}"))
+            elif schema.get("additionalProperties") is False:
+                errors.append(f"{path}.{key} is not allowed")
+        return errors
+    if expected == "integer" and (isinstance(data, bool) or not isinstance(data, int)):
+        return [f"{path} must be an integer"]
+    if expected == "number" and (isinstance(data, bool) or not isinstance(data, (int, float))):
+        return [f"{path} must be a number"]
+    if expected == "string" and not isinstance(data, str):
+        return [f"{path} must be a string"]
+    errors = []
+    if "minimum" in schema and data < schema["minimum"]:
+        errors.append(f"{path} must be at least {schema['minimum']}")
+    if "maximum" in schema and data > schema["maximum"]:
+        errors.append(f"{path} must be at most {schema['maximum']}")
+    return errors
+
+
+def parse_score(text, schema):
+    """
+    Parse and validate a scoring response. Returns (score, errors): 'score' is the validated dict,
+    or None with the list of problems. With per-criterion scores, the total is recomputed from them.
+    """
+    # Models without native structured output sometimes wrap the JSON in a code fence
+    text = re.sub(r"^\s*```(?:json)?\s*|\s*```\s*$", "", text or "")
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        return None, [f"the response is not valid JSON ({e})"]
+    # The total is the sum of the criterion scores, whatever arithmetic the model did
+    if isinstance(data, dict) and isinstance(data.get("scores"), dict) and all(
+            isinstance(value, int) and not isinstance(value, bool) for value in data["scores"].values()):
+        data["total"] = sum(data["scores"].values())
+    errors = validate(data, schema)
+    if errors:
+        return None, errors
+    return data, []
+
+
+def build_scoring_instructions(rubric, criteria):
+    """
+    Builds scoring instructions based on the provided rubric for AI scoring.
+    """
+    if criteria:
+        keys = "\n".join(f'- "{criterion["key"]}": {criterion["name"]}' for criterion in criteria)
+        output_format = (f'Return a JSON object with "scores", holding an integer score for each criterion '
+                         f'under these keys:\n{keys}\nand "total", the sum of the scores.')
+    else:
+        output_format = 'Return a JSON object with "total", the integer score.'
+    return f"""
+        Please score the user's previous response based on the following rubric: \n{rubric}
+        \n\n{output_format} Output only the JSON.
+        """
+
+
+def build_repair_instructions(scoring_instructions, response, errors):
+    """Ask the model to correct a scoring response that failed validation."""
+    problems = "\n".join(f"- {error}" for error in errors)
+    return f"""{scoring_instructions}
+        \n\nYour previous output was:\n{response}\n\nIt could not be used because:\n{problems}
+        \n\nReturn the corrected JSON only."""
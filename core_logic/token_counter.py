@@ -0,0 +1,171 @@
+import base64
+import math
+import re
+import struct
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken ships with langchain-openai, but fall back to heuristics without it
+    tiktoken = None
+
+# Average characters per token for each LLM family when no local tokenizer is available
+CHARS_PER_TOKEN = {
+    "openai": 4.0,
+    "rag": 4.0,
+    "claude": 3.5,
+    "gemini": 4.0,
+    "perplexity": 4.0,
+}
+
+# Role markers and separators added around every chat message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Image token cost when the image dimensions cannot be read
+DEFAULT_IMAGE_TOKENS = {
+    "openai": 765,
+    "rag": 765,
+    "claude": 1600,
+    "gemini": 258,
+    "perplexity": 765,
+}
+
+_encodings = {}
+
+
+def _get_encoding(model):
+    """Return a cached tiktoken encoding for an OpenAI model, or None if unavailable."""
+    if tiktoken is None:
+        return None
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("o200k_base")
+    return _encodings[model]
+
+
+def count_text_tokens(text, family, model=None):
+    """Estimate the number of tokens in 'text' for the given LLM family."""
+    if not text:
+        return 0
+    text = str(text)
+    if family in ("openai", "rag"):
+        encoding = _get_encoding(model or "gpt-4o")
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+    return int(math.ceil(len(text) / CHARS_PER_TOKEN.get(family, 4.0)))
+
+
+def get_image_size(image_url):
+    """
+    Read the (width, height) of a base64 data URL image from its header bytes.
+    Supports PNG, JPEG, GIF and WebP. Returns None if the size cannot be determined.
+    """
+    match = re.match(r"data:[^;]*;base64,", image_url or "")
+    if not match:
+        return None
+    # The first 64KB is plenty to reach the size header of any supported format
+    encoded = image_url[match.end():match.end() + 87384]
+    data = base64.b64decode(encoded[:len(encoded) - len(encoded) % 4])
+
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return struct.unpack("<HH", data[6:10])
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP" and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b"VP8 ":
+            width, height = struct.unpack("<HH", data[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b"VP8L":
+            bits = int.from_bytes(data[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b"VP8X":
+            return int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+    if data[:2] == b"\xff\xd8":
+        index = 2
+        while index + 9 < len(data):
+            if data[index] != 0xFF:
+                index += 1
+                continue
+            marker = data[index + 1]
+            if marker in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+                height, width = struct.unpack(">HH", data[index + 5:index + 9])
+                return width, height
+            segment_length = struct.unpack(">H", data[index + 2:index + 4])[0]
+            index += 2 + segment_length
+    return None
+
+
+def estimate_image_tokens(image_url, family):
+    """Estimate the input tokens a vision model charges for one image."""
+    size = get_image_size(image_url)
+    if not size or not all(size):
+        return DEFAULT_IMAGE_TOKENS.get(family, 765)
+    width, height = size
+
+    if family == "gemini":
+        return DEFAULT_IMAGE_TOKENS["gemini"]
+    if family == "claude":
+        # Claude downscales the long edge to 1568px and charges roughly (w * h) / 750
+        scale = min(1.0, 1568 / max(width, height))
+        return int(math.ceil(width * scale * height * scale / 750))
+
+    # OpenAI high detail: fit within 2048x2048, shortest side to 768, then 170 tokens per 512px tile
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return 85 + 170 * tiles
+
+
+def estimate_request(context, family):
+    """
+    Estimate the tokens and worst-case price of a fully assembled request before it is sent.
+    Output is assumed to use the full 'max_tokens' budget.
+    """
+    model = context.get("model")
+    texts = [context.get("SYSTEM_PROMPT", ""), context.get("phase_instructions", ""), context.get("user_prompt", "")]
+    for history in context.get("chat_history") or []:
+        texts.extend([history.get("user", ""), history.get("assistant", "")])
+
+    text_tokens = sum(count_text_tokens(text, family, model) + MESSAGE_OVERHEAD_TOKENS for text in texts)
+    image_tokens = 0
+    if context.get("supports_image"):
+        image_tokens = sum(estimate_image_tokens(url, family) for url in context.get("image_urls") or [])
+
+    input_tokens = text_tokens + image_tokens
+    output_tokens = int(context.get("max_tokens", 0))
+    input_price = input_tokens * context["price_input_token_1M"] / 1000000
+    return {
+        "input_tokens": input_tokens,
+        "image_tokens": image_tokens,
+        "output_tokens": output_tokens,
+        "input_price": input_price,
+        "price": input_price + output_tokens * context["price_output_token_1M"] / 1000000,
+    }
+
+
+def apply_request_budget(context, family, budget):
+    """
+    Trim the oldest chat history until the request fits the budget.
+    'budget' may set 'max_input_tokens' and 'max_price'. Returns (estimate, error_message);
+    error_message is None when the (possibly trimmed) request fits.
+    """
+    max_input_tokens = budget.get("max_input_tokens")
+    max_price = budget.get("max_price")
+    estimate = estimate_request(context, family)
+
+    def over_budget(current):
+        return ((max_input_tokens is not None and current["input_tokens"] > max_input_tokens) or
+                (max_price is not None and current["price"] > max_price))
+
+    while over_budget(estimate) and context.get("chat_history"):
+        context["chat_history"] = context["chat_history"][1:]
+        estimate = estimate_request(context, family)
+
+    if over_budget(estimate):
+        return estimate, (f"Request rejected: estimated {estimate['input_tokens']} input tokens "
+                          f"(up to ${estimate['price']:.4f}) exceeds this app's limit.")
+    return estimate, None
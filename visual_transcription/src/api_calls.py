@@ -1,84 +1,88 @@
 import requests
-import cv2
-from azure.ai.vision.imageanalysis.models import VisualFeatures
 from pprint import pprint
 import os
-import base64
-
-
-def analyze_image_Azure_Vision_Analysis(image_data, client, visual_features):
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+
+try:
+    from ..utils.image_encoding import encode_jpeg, to_data_url
+except ImportError:  # imported as a top-level package by the standalone app
+    from utils.image_encoding import encode_jpeg, to_data_url
+
+try:
+    from azure.ai.vision.imageanalysis.models import VisualFeatures
+except ImportError:  # only needed for the Azure backend
+    VisualFeatures = None
+
+OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
+
+# Defaults for transcribing saved frames with GPT-4o
+TRANSCRIBE_SETTINGS = {
+    "model": "gpt-4o",
+    "max_workers": 4,       # frames transcribed at once
+    "max_attempts": 3,      # per frame, including the first try
+    "timeout": 60,          # seconds per request
+    "backoff_seconds": 2.0, # first retry delay, doubled on every attempt
+}
+
+# HTTP statuses worth retrying: timeouts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# Azure Image Analysis visual features, and those requested when none are selected
+AZURE_VISUAL_FEATURES = ["TAGS", "OBJECTS", "CAPTION", "DENSE_CAPTIONS", "READ", "SMART_CROPS", "PEOPLE"]
+AZURE_DEFAULT_FEATURES = ["CAPTION"]
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def describe_azure_result(result):
+    """Build the transcript text from an Image Analysis result, one line per returned feature."""
+    lines = []
+    if result.get("captionResult"):
+        lines.append(result["captionResult"]["text"])
+    if result.get("denseCaptionsResult"):
+        lines.append("Details: " + "; ".join(value["text"] for value in result["denseCaptionsResult"]["values"]))
+    if result.get("readResult"):
+        text = " ".join(line["text"] for block in result["readResult"]["blocks"] for line in block["lines"])
+        if text:
+            lines.append(f"Text: {text}")
+    if result.get("tagsResult"):
+        lines.append("Tags: " + ", ".join(value["name"] for value in result["tagsResult"]["values"]))
+    if result.get("objectsResult"):
+        names = [value["tags"][0]["name"] for value in result["objectsResult"]["values"] if value.get("tags")]
+        if names:
+            lines.append("Objects: " + ", ".join(names))
+    if result.get("peopleResult"):
+        lines.append(f"People: {len(result['peopleResult']['values'])}")
+    return "\n".join(lines)
+
+
+def analyze_image_Azure_Vision_Analysis(image_data, client, visual_features=None):
     """
-    Sends an image to the Azure Image Analysis endpoint and returns the analysis result.
-    
+    Sends an image to the Azure Image Analysis endpoint, requesting only the selected visual features.
+    Every extra feature adds latency and is billed separately, so by default only the caption is requested.
+
     Args:
-        image_path (str): Path to the image file.
-        endpoint_url (str): The full endpoint URL (e.g., "https://<your-region>.api.cognitive.microsoft.com/imageanalysis:analyze").
-        subscription_key (str): Your subscription key for the service.
-        
+        image_data (numpy.ndarray): The frame, in RGB order.
+        client (ImageAnalysisClient): The Image Analysis client.
+        visual_features (list): Names from AZURE_VISUAL_FEATURES; AZURE_DEFAULT_FEATURES when empty.
+
     Returns:
-        dict: JSON response containing the analysis result.
+        dict: {"message": text built from the requested results, "confidence": caption confidence or None}.
     """
-    print("visual_features = ", visual_features)
-
-    # Convert the image (NumPy array) to bytes
-    _, image_bytes = cv2.imencode('.jpg', image_data)
-    image_data = image_bytes.tobytes()
-    
-    # visual_features_list = []
-
-    # if "TAGS" in visual_features:
-    #     visual_features_list.append(VisualFeatures.TAGS)
-
-    # if "OBJECTS" in visual_features:
-    #     visual_features_list.append(VisualFeatures.OBJECTS)
-
-    # if "CAPTION" in visual_features:
-    #     visual_features_list.append(VisualFeatures.CAPTION)
-    
-    # if "DENSE_CAPTIONS" in visual_features:
-    #     visual_features_list.append(VisualFeatures.DENSE_CAPTIONS)
-
-    # if "READ" in visual_features:
-    #     visual_features_list.append(VisualFeatures.READ)
-
-    # if "SMART_CROPS" in visual_features:
-    #     visual_features_list.append(VisualFeatures.SMART_CROPS)
-
-    # if "PEOPLE" in visual_features:
-    #     visual_features_list.append(VisualFeatures.PEOPLE)
-
-    visual_features =[ #TODO: Make this customizable
-        VisualFeatures.TAGS,
-        VisualFeatures.OBJECTS,
-        VisualFeatures.CAPTION,
-        VisualFeatures.DENSE_CAPTIONS,
-        VisualFeatures.READ,
-        VisualFeatures.SMART_CROPS,
-        VisualFeatures.PEOPLE,
-    ]
-
-
+    features = [getattr(VisualFeatures, name) for name in (visual_features or AZURE_DEFAULT_FEATURES)]
     result = client._analyze_from_image_data(
-        image_data=image_data,
-        visual_features=visual_features,
+        image_data=encode_jpeg(image_data),
+        visual_features=features,
         gender_neutral_caption=False,
         language="en"
     )
-    print("result = ", result)
-    message = result["captionResult"]["text"]
-    confidence = result["captionResult"]["confidence"]
-    
-
-    return {"message": message, "confidence": confidence}
-
-    # Send the POST request with the image data.
-    # response = requests.post(endpoint_url, headers=headers, params=params, data=image_data)
-    
-    # # Raise an exception if the request was not successful.
-    # response.raise_for_status()
-    
-    # Return the JSON result.
-    # return response.json()
+    caption = result.get("captionResult") or {}
+    return {"message": describe_azure_result(result), "confidence": caption.get("confidence")}
 
 
 def analyze_image_gpt4(image_data, prompt):
@@ -103,16 +107,12 @@ def analyze_image_gpt4(image_data, prompt):
         "api-key": api_key
     }
 
-    # Convert the image (NumPy array) to base64-encoded JPEG
+    # Convert the image (RGB NumPy array) to a base64-encoded JPEG
     try:
-        _, buffer = cv2.imencode('.jpg', image_data)  # Convert numpy array to JPEG
-        base64_image = base64.b64encode(buffer).decode("utf-8")  # Encode to Base64
+        image_payload = {"url": to_data_url(image_data)}  # Now an object, not a string
     except Exception as e:
         return {"error": f"Failed to process image: {str(e)}"}
 
-    # ✅ **Correcting `image_url` Structure** ✅
-    image_payload = {"url": f"data:image/jpeg;base64,{base64_image}"}  # Now an object, not a string
-
     # Construct the payload
     payload = {
         "messages": [
@@ -126,8 +126,8 @@ def analyze_image_gpt4(image_data, prompt):
         "temperature": 0.5
     }
 
-    # Send the request
-    response = requests.post(url, headers=headers, json=payload)
+    # Send the request over the shared session
+    response = get_http_session().post(url, headers=headers, json=payload, timeout=TRANSCRIBE_SETTINGS["timeout"])
 
     # Debug response if error occurs
     if response.status_code != 200:
@@ -136,3 +136,90 @@ def analyze_image_gpt4(image_data, prompt):
 
     pprint(response.json())
     return response.json()
+
+
+def get_http_session():
+    """Return the process-wide requests.Session, so concurrent calls reuse pooled keep-alive connections."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=TRANSCRIBE_SETTINGS["max_workers"] * 2)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def _retry_delay(attempt, response=None):
+    """Exponential backoff with jitter, or the server's Retry-After when it asks for longer."""
+    delay = TRANSCRIBE_SETTINGS["backoff_seconds"] * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return max(delay, float(retry_after)) if retry_after else delay
+    except ValueError:
+        return delay
+
+
+def transcribe_frame(image_rgb, prompt, api_key, max_tokens, session=None, max_attempts=None):
+    """
+    Transcribe one RGB frame with the OpenAI chat completions API, retrying transient failures.
+
+    Parameters:
+    - image_rgb (numpy.ndarray): The frame, in RGB order.
+    - prompt (str): The transcription prompt.
+    - api_key (str): OpenAI API key.
+    - max_tokens (int): Output token limit.
+
+    Returns:
+    - str: The transcription. Raises requests.RequestException once all attempts have failed.
+    """
+    session = session or get_http_session()
+    max_attempts = max_attempts or TRANSCRIBE_SETTINGS["max_attempts"]
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
+    payload = {
+        "model": TRANSCRIBE_SETTINGS["model"],
+        "messages": [
+            {"role": "user", "content": [
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": {"url": to_data_url(image_rgb)}}
+            ]}
+        ],
+        "max_tokens": max_tokens
+    }
+
+    for attempt in range(1, max_attempts + 1):
+        try:
+            response = session.post(OPENAI_CHAT_URL, headers=headers, json=payload,
+                                    timeout=TRANSCRIBE_SETTINGS["timeout"])
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == max_attempts:
+                raise
+            time.sleep(_retry_delay(attempt))
+            continue
+        if response.status_code in RETRYABLE_STATUS_CODES and attempt < max_attempts:
+            time.sleep(_retry_delay(attempt, response))
+            continue
+        response.raise_for_status()
+        return response.json()['choices'][0]['message']['content']
+
+
+def transcribe_frames(frames, prompt, api_key, max_tokens, max_workers=None):
+    """
+    Transcribe several frames concurrently over one shared HTTP session.
+
+    Parameters:
+    - frames (dict): {frame_number: RGB numpy.ndarray}.
+
+    Yields:
+    - (frame_number, transcription, error) as each frame completes; error is None on success.
+      A frame that fails after its retries does not stop the others.
+    """
+    session = get_http_session()
+    max_workers = max_workers or TRANSCRIBE_SETTINGS["max_workers"]
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vt-transcribe") as executor:
+        futures = {executor.submit(transcribe_frame, image, prompt, api_key, max_tokens, session): frame_number
+                   for frame_number, image in frames.items()}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
@@ -0,0 +1,113 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .api_calls import (AZURE_DEFAULT_FEATURES, AZURE_VISUAL_FEATURES, TRANSCRIBE_SETTINGS,
+                        analyze_image_Azure_Vision_Analysis, analyze_image_gpt4)
+
+try:
+    from azure.ai.vision.imageanalysis import ImageAnalysisClient
+    from azure.core.credentials import AzureKeyCredential
+except ImportError:  # only needed for the Azure backend
+    ImageAnalysisClient = None
+
+AZURE_VISION_ENDPOINT = os.getenv("AZURE_VISION_ENDPOINT", "https://rnd-calivision.cognitiveservices.azure.com/")
+
+# Registered backends by display name; the model selector lists every entry
+VISION_BACKENDS = {}
+
+
+def register_backend(backend_class):
+    """Class decorator that adds one shared instance of a backend to VISION_BACKENDS."""
+    VISION_BACKENDS[backend_class.name] = backend_class()
+    return backend_class
+
+
+def get_backend(name):
+    try:
+        return VISION_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Invalid model selected: {name}") from None
+
+
+class VisionBackend:
+    """
+    A model that turns a frame into a visual transcript.
+
+    Subclasses set 'name' and implement analyze(). 'features' lists the visual features the user can
+    choose from (empty when the backend has none), and 'default_features' those requested when the
+    user chooses none. One instance is shared by every session, so clients and sessions it creates
+    are reused across requests.
+    """
+
+    name = None
+    features = ()
+    default_features = ()
+    max_workers = TRANSCRIBE_SETTINGS["max_workers"]
+
+    def analyze(self, image_rgb, options):
+        """Return the transcript of one RGB frame; 'options' is the backend's settings dict."""
+        raise NotImplementedError
+
+    def analyze_batch(self, images, options, max_workers=None):
+        """
+        Transcribe several frames concurrently.
+
+        Parameters:
+            images (dict): {frame_number: RGB numpy.ndarray}.
+            options (dict): The backend's settings dict.
+
+        Yields:
+            (frame_number, transcript, error) as each frame completes; error is None on success.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_workers,
+                                thread_name_prefix="vt-vision") as executor:
+            futures = {executor.submit(self.analyze, image, options): frame_number
+                       for frame_number, image in images.items()}
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], None, e
+
+
+@register_backend
+class AzureVisionBackend(VisionBackend):
+    """Azure AI Vision Image Analysis; only the selected visual features are requested."""
+
+    name = "Azure Vision Add Captions"
+    features = tuple(AZURE_VISUAL_FEATURES)
+    default_features = tuple(AZURE_DEFAULT_FEATURES)
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get_client(self):
+        """Return the Image Analysis client, created on first use and shared afterwards."""
+        with self._lock:
+            if self._client is None:
+                if ImageAnalysisClient is None:
+                    raise RuntimeError("The Azure backend needs the azure-ai-vision-imageanalysis package.")
+                self._client = ImageAnalysisClient(
+                    endpoint=AZURE_VISION_ENDPOINT,
+                    credential=AzureKeyCredential(os.getenv("PERSONAL_AZURE_VISION_KEY"))
+                )
+            return self._client
+
+    def analyze(self, image_rgb, options):
+        response = analyze_image_Azure_Vision_Analysis(image_rgb, self.get_client(), options.get("visual_features"))
+        return response["message"]
+
+
+@register_backend
+class GPT4oBackend(VisionBackend):
+    """GPT-4o on Azure OpenAI, prompted with the configured transcription prompt."""
+
+    name = "gpt-4o"
+
+    def analyze(self, image_rgb, options):
+        response = analyze_image_gpt4(image_rgb, options["prompt"])
+        if "error" in response:
+            raise RuntimeError(f"gpt-4o request failed: {response['error']}")
+        return response["choices"][0]["message"]["content"]
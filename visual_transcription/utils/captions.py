@@ -0,0 +1,79 @@
+import io
+import re
+from collections import namedtuple
+
+# One caption cue; start and end are in seconds
+Cue = namedtuple("Cue", ["index", "start", "end", "text"])
+
+# WebVTT blocks that carry no cue
+VTT_SKIPPED_BLOCKS = ("WEBVTT", "NOTE", "STYLE", "REGION")
+# Inline markup such as <i>, <b>, <v Speaker> or <00:00:01.000>
+TAG_PATTERN = re.compile(r"<[^>]*>")
+
+
+def parse_timestamp(value):
+    """Convert an SRT (HH:MM:SS,mmm) or WebVTT ([HH:]MM:SS.mmm) timestamp to seconds."""
+    parts = value.strip().replace(',', '.').split(':')
+    if not 2 <= len(parts) <= 3:
+        raise ValueError(f"Invalid caption timestamp: {value!r}")
+    return sum(float(part) * 60 ** i for i, part in enumerate(reversed(parts)))
+
+
+def _parse_block(lines, count):
+    """Turn the lines of one block into a Cue, or None if the block has no valid timing line."""
+    if lines[0].startswith(VTT_SKIPPED_BLOCKS):
+        return None
+    timing = next((i for i, line in enumerate(lines) if "-->" in line), None)
+    if timing is None:
+        return None
+    start, end = lines[timing].split("-->", 1)
+    try:
+        # WebVTT cue settings (e.g. "align:start") follow the end time
+        start, end = parse_timestamp(start), parse_timestamp(end.split()[0])
+    except (ValueError, IndexError):
+        return None
+    identifier = lines[timing - 1].strip() if timing > 0 else ""
+    index = int(identifier) if identifier.isdigit() else count
+    text = "\n".join(TAG_PATTERN.sub("", line).strip() for line in lines[timing + 1:]).strip()
+    return Cue(index, start, end, text)
+
+
+def parse_captions(stream):
+    """
+    Parse an SRT or WebVTT caption file cue by cue.
+
+    The byte stream is decoded incrementally, so only the current cue is held in memory however long
+    the captions are. A UTF-8 byte order mark and Windows line endings are handled, multi-line cues
+    keep all their lines, and inline markup tags are removed. Blocks without a valid timing line
+    are skipped.
+
+    Parameters:
+        stream (file-like): Binary stream of the caption file, e.g. a Streamlit UploadedFile.
+
+    Yields:
+        Cue: (index, start, end, text) in file order; index is the cue number, or the cue's position
+        in the file when it has none.
+    """
+    if stream.seekable():
+        stream.seek(0)
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline=None)
+    try:
+        lines, count = [], 0
+        for line in text_stream:
+            line = line.rstrip("\n")
+            if line.strip():
+                lines.append(line)
+                continue
+            if lines:
+                cue = _parse_block(lines, count + 1)
+                if cue is not None:
+                    count += 1
+                    yield cue
+                lines = []
+        if lines:
+            cue = _parse_block(lines, count + 1)
+            if cue is not None:
+                yield cue
+    finally:
+        # Hand the stream back to its owner open
+        text_stream.detach()
@@ -0,0 +1,75 @@
+import cv2
+import numpy as np
+
+# Every crop is a polygon of (x, y) pixel coordinates; a rectangle is a four-point polygon.
+
+
+def rect_points(rect, scale=(1.0, 1.0)):
+    """
+    Return the corners of a canvas rectangle ({'left', 'top', 'width', 'height'}) as polygon points,
+    scaled by (scale_x, scale_y) into frame pixels. Raises ValueError for an empty rectangle.
+    """
+    left, top = int(rect['left'] * scale[0]), int(rect['top'] * scale[1])
+    width, height = int(rect['width'] * scale[0]), int(rect['height'] * scale[1])
+    if width <= 0 or height <= 0:
+        raise ValueError("Please draw a valid rectangle.")
+    # The polygon includes its edge pixels, so the far corner is the last pixel inside the rectangle
+    right, bottom = left + width - 1, top + height - 1
+    return np.array([[left, top], [right, top], [right, bottom], [left, bottom]], dtype=np.float64)
+
+
+def path_points(path, scale=(1.0, 1.0)):
+    """
+    Return the points of a canvas freehand path as polygon points scaled into frame pixels.
+
+    Each path command ends with the point it draws to (e.g. ["M", x, y], ["L", x, y], or
+    ["Q", cx, cy, x, y]); those end points form the outline. Raises ValueError with fewer than three.
+    """
+    ends = [command[-2:] for command in path or [] if len(command) >= 3]
+    try:
+        points = np.array(ends, dtype=np.float64).reshape(-1, 2)
+    except (ValueError, TypeError):
+        # Drop malformed commands; the common all-numeric case stays a single conversion
+        points = np.array([end for end in ends if _is_point(end)], dtype=np.float64).reshape(-1, 2)
+    if len(points) < 3:
+        raise ValueError("Not enough valid points to create a crop area. Please try again.")
+    return points * np.asarray(scale, dtype=np.float64)
+
+
+def _is_point(values):
+    try:
+        return all(np.isfinite(float(value)) for value in values)
+    except (TypeError, ValueError):
+        return False
+
+
+def crop_polygon(image, points):
+    """
+    Crop an image to a polygon, blacking out pixels outside it.
+
+    The bounding box is found first and the polygon is rasterised only inside it, so the cost depends
+    on the size of the crop rather than the frame. When the polygon fills its bounding box (as a
+    rectangle does) the region is returned as a view without masking.
+
+    Parameters:
+        image (numpy.ndarray): BGR, RGB or greyscale frame.
+        points (numpy.ndarray): N x 2 array of (x, y) pixel coordinates.
+
+    Returns:
+        numpy.ndarray: The cropped image. Raises ValueError if the polygon lies outside the image.
+    """
+    height, width = image.shape[:2]
+    points = np.floor(points).astype(np.int32)
+    np.clip(points[:, 0], 0, width - 1, out=points[:, 0])
+    np.clip(points[:, 1], 0, height - 1, out=points[:, 1])
+
+    (x1, y1), (x2, y2) = points.min(axis=0), points.max(axis=0) + 1
+    if x2 - x1 < 2 or y2 - y1 < 2:
+        raise ValueError("Crop area is outside image boundaries or too small. Please try again.")
+    roi = image[y1:y2, x1:x2]
+
+    mask = np.zeros(roi.shape[:2], dtype=np.uint8)
+    cv2.fillPoly(mask, [points - (x1, y1)], 255)
+    if cv2.countNonZero(mask) == mask.size:
+        return roi
+    return cv2.bitwise_and(roi, roi, mask=mask)
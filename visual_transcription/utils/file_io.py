@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+
+def atomic_write(path, data):
+    """
+    Write bytes so that 'path' holds either the old or the new content, even after a crash:
+    the data goes to a uniquely named temporary file in the same directory, is flushed to disk, and
+    replaces 'path'. Concurrent writers never share a temporary file.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    # Persist the rename itself (not supported on Windows)
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(directory, os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Decoded frames kept per video (a 1080p BGR frame is about 6 MB)
+FRAME_CACHE_SIZE = 24
+# Frames decoded ahead of the user in the current navigation direction
+PREFETCH_COUNT = 4
+# Targets at most this many frames ahead are reached by decoding forward instead of seeking
+MAX_FORWARD_DECODE = 90
+# Number of recent frame requests kept for latency statistics
+LATENCY_SAMPLES = 200
+
+
+class FrameServer:
+    """
+    Random access to the frames of a video file, built on cv2.VideoCapture.
+
+    Decoded frames are kept in a bounded LRU cache, frames close ahead of the decoder are reached by
+    decoding forward instead of seeking to the previous keyframe, and the next frames in the direction the
+    user is moving are prefetched on a background thread. Frames are shared with the cache and must be
+    treated as read-only.
+
+    The object also answers isOpened(), get() and release() like the VideoCapture it wraps;
+    'api_preference' selects its backend as for cv2.VideoCapture.
+    """
+
+    def __init__(self, path, cache_size=FRAME_CACHE_SIZE, prefetch_count=PREFETCH_COUNT, api_preference=cv2.CAP_ANY):
+        self.path = path
+        self.capture = cv2.VideoCapture(path, api_preference)
+        self.cache_size = cache_size
+        self.prefetch_count = prefetch_count
+        self.total_frames = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS)
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()  # guards the capture, its position and the cache
+        self._position = 0  # frame number the next capture.read() returns
+        self._last_requested = None
+        self._direction = 1
+        self._generation = 0  # bumped on every request so stale prefetches stop early
+        self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="frame-prefetch")
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._hits = deque(maxlen=LATENCY_SAMPLES)
+
+    # VideoCapture compatibility
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def get(self, prop):
+        return self.capture.get(prop)
+
+    def release(self):
+        self._generation += 1
+        self._prefetcher.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self.capture.release()
+            self._cache.clear()
+
+    def _cache_put(self, frame_number, frame):
+        self._cache[frame_number] = frame
+        self._cache.move_to_end(frame_number)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _decode(self, frame_number):
+        """Decode one frame into the cache. Must be called with the lock held."""
+        if frame_number in self._cache:
+            self._cache.move_to_end(frame_number)
+            return self._cache[frame_number]
+
+        distance = frame_number - self._position
+        if not 0 <= distance <= MAX_FORWARD_DECODE:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+            self._position = frame_number
+        # grab() skips the colour conversion and copy for frames we do not keep
+        while self._position < frame_number:
+            if not self.capture.grab():
+                return None
+            self._position += 1
+
+        ret, frame = self.capture.read()
+        if not ret:
+            return None
+        self._position = frame_number + 1
+        self._cache_put(frame_number, frame)
+        return frame
+
+    def _prefetch(self, frame_numbers, generation):
+        # Ascending order lets the decoder run forward through the whole batch after at most one seek
+        for frame_number in sorted(frame_numbers):
+            if generation != self._generation:
+                return
+            with self._lock:
+                if frame_number not in self._cache:
+                    self._decode(frame_number)
+
+    def read_frame(self, frame_number, increment=1, prefetch=True):
+        """
+        Return the BGR frame 'frame_number', or None if it cannot be decoded.
+        Unless 'prefetch' is False, the following frames, 'increment' apart in the direction of travel,
+        are then prefetched.
+        """
+        started = time.perf_counter()
+        if self._last_requested is not None and frame_number != self._last_requested:
+            self._direction = 1 if frame_number > self._last_requested else -1
+        self._last_requested = frame_number
+        self._generation += 1
+
+        with self._lock:
+            hit = frame_number in self._cache
+            frame = self._decode(frame_number)
+
+        self._latencies.append(time.perf_counter() - started)
+        self._hits.append(hit)
+
+        step = max(1, int(increment)) * self._direction
+        upcoming = [frame_number + step * k for k in range(1, self.prefetch_count + 1)]
+        upcoming = [n for n in upcoming if 0 <= n < self.total_frames]
+        if prefetch and frame is not None and upcoming:
+            self._prefetcher.submit(self._prefetch, upcoming, self._generation)
+        return frame
+
+    def latency_stats(self):
+        """Return the request count, cache hit rate and p50/p95 latency (ms) of recent frame requests."""
+        if not self._latencies:
+            return {"requests": 0, "hit_rate": 0.0, "p50_ms": 0.0, "p95_ms": 0.0}
+        latencies_ms = np.array(self._latencies) * 1000
+        return {
+            "requests": len(latencies_ms),
+            "hit_rate": sum(self._hits) / len(self._hits),
+            "p50_ms": float(np.percentile(latencies_ms, 50)),
+            "p95_ms": float(np.percentile(latencies_ms, 95)),
+        }
+
+
+class FrameSequence:
+    """
+    The frames of a video as a lazily decoded, indexable sequence of RGB PIL images.
+
+    Frames are decoded on access through a FrameServer, so memory is bounded by the frame cache
+    rather than the length of the video.
+    """
+
+    def __init__(self, path, cache_size=FRAME_CACHE_SIZE):
+        self.server = FrameServer(path, cache_size=cache_size)
+        self.fps = self.server.fps
+
+    def __len__(self):
+        return self.server.total_frames
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("frame index out of range")
+        frame = self.server.read_frame(index)
+        if frame is None:
+            raise IndexError(f"frame {index} could not be decoded")
+        return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def release(self):
+        self.server.release()
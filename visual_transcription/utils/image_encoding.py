@@ -0,0 +1,60 @@
+import base64
+
+import cv2
+import numpy as np
+
+# JPEG quality for frames sent to vision models
+JPEG_QUALITY = 90
+# Sidebar thumbnails are downscaled to this width before encoding
+THUMBNAIL_WIDTH = 320
+THUMBNAIL_QUALITY = 80
+
+
+def encode_jpeg(image, quality=JPEG_QUALITY):
+    """
+    Encode an RGB image as JPEG bytes in memory.
+
+    Parameters:
+        image (numpy.ndarray or PIL.Image.Image): RGB (or greyscale) image.
+        quality (int): JPEG quality, 0-100.
+
+    Returns:
+        bytes: The encoded JPEG.
+    """
+    image = np.asarray(image)
+    if image.ndim == 3:
+        # OpenCV encodes BGR; frames in session state are RGB
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not ok:
+        raise ValueError("Could not encode image as JPEG.")
+    return buffer.tobytes()
+
+
+def image_to_base64(image, quality=JPEG_QUALITY):
+    """Return an RGB image (NumPy array or PIL image) as a base64-encoded JPEG string."""
+    return base64.b64encode(encode_jpeg(image, quality)).decode("utf-8")
+
+
+def to_data_url(image, quality=JPEG_QUALITY):
+    """Return an RGB image as a base64 JPEG data URL."""
+    return f"data:image/jpeg;base64,{image_to_base64(image, quality)}"
+
+
+def make_thumbnail(image, width=THUMBNAIL_WIDTH):
+    """Downscale an RGB image to at most 'width' pixels wide, keeping its aspect ratio."""
+    image = np.asarray(image)
+    height, current_width = image.shape[:2]
+    if current_width <= width:
+        return image
+    return cv2.resize(image, (width, max(1, int(height * width / current_width))), interpolation=cv2.INTER_AREA)
+
+
+def thumbnail_base64(frame_info):
+    """
+    Return the base64 JPEG sidebar thumbnail of a saved frame, encoding it only once.
+    The thumbnail is cached in the frame's own entry, so re-saving a frame replaces it.
+    """
+    if frame_info.get('thumbnail_base64') is None:
+        frame_info['thumbnail_base64'] = image_to_base64(make_thumbnail(frame_info['frame']), THUMBNAIL_QUALITY)
+    return frame_info['thumbnail_base64']
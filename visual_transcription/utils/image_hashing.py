@@ -0,0 +1,99 @@
+import cv2
+import numpy as np
+
+# dHash compares horizontally adjacent pixels of a (HASH_SIZE + 1) x HASH_SIZE thumbnail: 64 bits
+HASH_SIZE = 8
+# Hashes at most this many bits apart are treated as the same image when reusing transcriptions
+DUPLICATE_DISTANCE = 5
+
+
+def to_gray(image):
+    """Return a single-channel view of an RGB/BGR/grey NumPy image (channel order does not matter for hashing)."""
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    return image
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """
+    Compute the difference hash of an image as an integer of hash_size * hash_size bits.
+
+    Parameters:
+        image (numpy.ndarray): RGB, BGR or greyscale image.
+        hash_size (int): Side length of the hash grid.
+
+    Returns:
+        int: The perceptual hash; similar images have hashes a small Hamming distance apart.
+    """
+    small = cv2.resize(to_gray(image), (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(hash_a, hash_b):
+    """Return the number of differing bits between two hashes."""
+    return bin(hash_a ^ hash_b).count("1")
+
+
+def gray_histogram(image, bins=32):
+    """Return the normalised grey-level histogram of an image as a float array summing to 1."""
+    gray = to_gray(image)
+    histogram = np.bincount((gray // (256 // bins)).ravel(), minlength=bins).astype(np.float64)
+    return histogram / max(1.0, histogram.sum())
+
+
+class HashIndex:
+    """
+    A similarity index over 64-bit perceptual hashes.
+    Lookups compare against every stored hash at once with vectorised XOR and popcount.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.hashes = np.zeros(0, dtype=np.uint64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, image_hash):
+        self.keys.append(key)
+        self.hashes = np.append(self.hashes, np.uint64(image_hash))
+
+    def nearest(self, image_hash, max_distance):
+        """Return (key, distance) of the closest stored hash within 'max_distance', or (None, None)."""
+        if not self.keys:
+            return None, None
+        differing = np.bitwise_xor(self.hashes, np.uint64(image_hash))
+        distances = np.unpackbits(differing.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+        best = int(np.argmin(distances))
+        if distances[best] > max_distance:
+            return None, None
+        return self.keys[best], int(distances[best])
+
+
+def find_duplicates(pending, known, max_distance):
+    """
+    Decide which frames need their own transcription.
+
+    Parameters:
+        pending (dict): {frame_number: hash} of frames still to transcribe.
+        known (dict): {frame_number: hash} of frames that already have a transcription.
+        max_distance (int): Largest Hamming distance treated as the same image.
+
+    Returns:
+        tuple: (unique, reuse). unique lists the pending frames to send; reuse maps each other pending
+        frame to the frame (known, or one of unique) whose transcription it can share.
+    """
+    index = HashIndex()
+    for frame_number, image_hash in known.items():
+        index.add(frame_number, image_hash)
+
+    unique, reuse = [], {}
+    for frame_number in sorted(pending):
+        match, _ = index.nearest(pending[frame_number], max_distance)
+        if match is None:
+            unique.append(frame_number)
+            index.add(frame_number, pending[frame_number])
+        else:
+            reuse[frame_number] = match
+    return unique, reuse
@@ -0,0 +1,126 @@
+import base64
+import hashlib
+import json
+import os
+
+from .file_io import atomic_write
+from .image_encoding import thumbnail_base64
+from .image_hashing import dhash
+
+# One directory per video, named by the SHA-256 of the video file
+PROJECTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database", "projects")
+PROJECT_FILE = "project.json"
+PROJECT_VERSION = 1
+
+# Saved-frame fields kept in the project; the frame image itself is re-decoded from the video
+FRAME_FIELDS = ("frame_number", "is_cropped", "crop_points", "has_visual_transcripts", "visual_transcripts",
+                "reused_from", "time_stamp", "hash")
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def project_dir(video_hash):
+    return os.path.join(PROJECTS_DIR, video_hash)
+
+
+def build_project(saved_frames, transcriptions, inserted_transcriptions, timeline, metadata=None):
+    """Return the JSON-serialisable project state of a workspace (without thumbnails)."""
+    frames = {}
+    for frame_number, frame_info in saved_frames.items():
+        if frame_info.get('hash') is None and frame_info.get('frame') is not None:
+            frame_info['hash'] = dhash(frame_info['frame'])
+        frames[str(frame_number)] = {field: frame_info.get(field) for field in FRAME_FIELDS}
+        frames[str(frame_number)]['frame_number'] = frame_number
+    return {
+        "version": PROJECT_VERSION,
+        "metadata": metadata or {},
+        "frames": frames,
+        "transcriptions": {str(n): text for n, text in transcriptions.items()},
+        "inserted_transcriptions": sorted(inserted_transcriptions),
+        "cues": [list(cue) for cue in timeline.cues()],
+        "visuals": [list(visual) for visual in timeline.visuals()],
+    }
+
+
+def _thumbnail_name(frame_record):
+    return f"{frame_record['frame_number']}_{frame_record['hash'] or 0:016x}.jpg"
+
+
+def save_project(video_hash, project, saved_frames, last_saved=None):
+    """
+    Write a project built by build_project(), plus a JPEG thumbnail per saved frame.
+
+    Thumbnails are written once per frame image, and project.json only when its content differs from
+    'last_saved' (the serialised project returned by the previous call). Returns the serialised project.
+    """
+    serialised = json.dumps(project, sort_keys=True)
+    if serialised == last_saved:
+        return serialised
+
+    directory = project_dir(video_hash)
+    frames_dir = os.path.join(directory, "frames")
+    os.makedirs(frames_dir, exist_ok=True)
+    wanted = set()
+    for key, record in project["frames"].items():
+        name = _thumbnail_name(record)
+        wanted.add(name)
+        path = os.path.join(frames_dir, name)
+        frame_info = saved_frames[int(key)]
+        if not os.path.exists(path) and frame_info.get('frame') is not None:
+            # The sidebar thumbnail, so a restored frame shows exactly what was saved
+            atomic_write(path, base64.b64decode(thumbnail_base64(frame_info)))
+
+    atomic_write(os.path.join(directory, PROJECT_FILE), serialised.encode("utf-8"))
+    # Drop thumbnails of frames that were removed or re-saved
+    for name in os.listdir(frames_dir):
+        if name not in wanted:
+            os.remove(os.path.join(frames_dir, name))
+    return serialised
+
+
+def load_project(video_hash):
+    """
+    Load a saved project, or return None if there is none or it cannot be read.
+    Frame numbers become ints again, and each frame record gains 'thumbnail_base64' when its
+    thumbnail is on disk.
+    """
+    path = os.path.join(project_dir(video_hash), PROJECT_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            project = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(project, dict) or project.get("version") != PROJECT_VERSION:
+        return None
+
+    frames = {}
+    for record in project.get("frames", {}).values():
+        thumbnail_path = os.path.join(project_dir(video_hash), "frames", _thumbnail_name(record))
+        try:
+            with open(thumbnail_path, "rb") as f:
+                record['thumbnail_base64'] = base64.b64encode(f.read()).decode("utf-8")
+        except OSError:
+            record['thumbnail_base64'] = None
+        frames[int(record['frame_number'])] = record
+    project["frames"] = frames
+    project["transcriptions"] = {int(n): text for n, text in project.get("transcriptions", {}).items()}
+    project["inserted_transcriptions"] = set(project.get("inserted_transcriptions", []))
+    return project
+
+
+def delete_project(video_hash):
+    """Remove a saved project and its thumbnails."""
+    directory = project_dir(video_hash)
+    if not os.path.isdir(directory):
+        return
+    for root, _, files in os.walk(directory, topdown=False):
+        for name in files:
+            os.remove(os.path.join(root, name))
+        os.rmdir(root)
@@ -0,0 +1,177 @@
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from .frame_server import FrameServer
+
+# Defaults for start_proxy
+PROXY_SETTINGS = {
+    "max_width": 960,    # proxy frames are downscaled to at most this width (the canvas shows at most 1080)
+    "quality": 80,       # MJPEG quality, 0-100
+    "max_workers": 1,    # proxy transcodes run one at a time, shared by every session
+    "max_age_hours": 12, # proxies left by sessions that ended without clearing are removed after this long
+}
+# Proxies are written to a directory owned by this process, removed when the process exits
+PROXY_DIR_PREFIX = "vt_proxies_"
+
+_pool = None
+_pool_lock = threading.Lock()
+_proxy_dir = None
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PROXY_SETTINGS["max_workers"])
+        return _pool
+
+
+def _get_proxy_dir():
+    global _proxy_dir
+    with _pool_lock:
+        if _proxy_dir is None:
+            _proxy_dir = tempfile.mkdtemp(prefix=PROXY_DIR_PREFIX)
+            atexit.register(shutil.rmtree, _proxy_dir, ignore_errors=True)
+        return _proxy_dir
+
+
+def proxy_path_for(video_path):
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    return os.path.join(_get_proxy_dir(), f"{name}.proxy.avi")
+
+
+def remove_proxy(proxy_path):
+    """Delete a proxy and any partial transcode of it."""
+    for path in (proxy_path, f"{proxy_path}.partial.avi"):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _remove_finished_proxy(future):
+    # A failed transcode has already removed its partial file
+    if not future.cancelled() and future.exception() is None:
+        remove_proxy(future.result()["path"])
+
+
+def discard_proxy_job(job):
+    """
+    Abandon a proxy transcode. A job still waiting is cancelled; one already running cannot be,
+    so its proxy is deleted as soon as it finishes.
+    """
+    if job is not None and not job.cancel():
+        job.add_done_callback(_remove_finished_proxy)
+
+
+def sweep_proxies(max_age_hours=None):
+    """
+    Delete proxies older than 'max_age_hours' (those of sessions that ended without clearing their
+    video), and the proxy directories of processes that exited without removing theirs.
+    """
+    max_age_hours = max_age_hours or PROXY_SETTINGS["max_age_hours"]
+    cutoff = time.time() - max_age_hours * 3600
+    proxy_dir = _get_proxy_dir()
+    # Mark this process's directory as in use, so other processes' sweeps leave it alone
+    os.utime(proxy_dir)
+    for entry in os.scandir(proxy_dir):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+    parent = os.path.dirname(proxy_dir)
+    for entry in os.scandir(parent):
+        try:
+            if (entry.name.startswith(PROXY_DIR_PREFIX) and entry.path != proxy_dir and entry.is_dir()
+                    and entry.stat().st_mtime < cutoff):
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except OSError:
+            pass
+
+
+def open_proxy(proxy_path):
+    """
+    Open a finished proxy for navigation. OpenCV's own MJPEG reader seeks through the AVI index
+    straight to the requested frame, where the FFmpeg backend decodes its way there.
+    """
+    return FrameServer(proxy_path, api_preference=cv2.CAP_OPENCV_MJPEG)
+
+
+def generate_proxy(video_path, proxy_path, max_width=None, quality=None):
+    """
+    Transcode a video to a small Motion-JPEG AVI with the same frame rate and frame numbering.
+
+    Every MJPEG frame is a keyframe, so seeking anywhere in the proxy costs a single small decode.
+    The proxy is written under a temporary name and renamed when complete, so a partly written
+    file is never opened. Runs in a worker process.
+
+    Returns:
+        dict: "path", "frames", "width", "height" and "seconds" of the finished proxy.
+    """
+    max_width = max_width or PROXY_SETTINGS["max_width"]
+    quality = quality or PROXY_SETTINGS["quality"]
+    started = time.perf_counter()
+    capture = cv2.VideoCapture(video_path)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    scale = min(1.0, max_width / width) if width else 1.0
+    # Even dimensions keep every decoder happy
+    size = (max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2))
+
+    temp_path = f"{proxy_path}.partial.avi"
+    os.makedirs(os.path.dirname(proxy_path), exist_ok=True)
+    writer = cv2.VideoWriter(temp_path, cv2.VideoWriter_fourcc(*"MJPG"), fps, size)
+    writer.set(cv2.VIDEOWRITER_PROP_QUALITY, quality)
+    frames = 0
+    try:
+        try:
+            if not writer.isOpened():
+                raise RuntimeError("Could not open the proxy video writer.")
+            while True:
+                ret, frame = capture.read()
+                if not ret:
+                    break
+                writer.write(cv2.resize(frame, size, interpolation=cv2.INTER_AREA))
+                frames += 1
+        finally:
+            capture.release()
+            writer.release()
+        if frames == 0:
+            raise RuntimeError("The video has no readable frames.")
+        os.replace(temp_path, proxy_path)
+    except BaseException:
+        # Never leave a partial proxy next to the upload
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return {"path": proxy_path, "frames": frames, "width": size[0], "height": size[1],
+            "seconds": time.perf_counter() - started}
+
+
+def start_proxy(video_path, max_width=None):
+    """
+    Start generating the navigation proxy of a video in a background process.
+
+    Returns:
+        concurrent.futures.Future or None: Resolves to the generate_proxy() result; None when the
+        video is already no wider than the proxy would be.
+    """
+    max_width = max_width or PROXY_SETTINGS["max_width"]
+    capture = cv2.VideoCapture(video_path)
+    width = capture.get(cv2.CAP_PROP_FRAME_WIDTH)
+    capture.release()
+    if width <= max_width:
+        return None
+    sweep_proxies()
+    return _get_pool().submit(generate_proxy, video_path, proxy_path_for(video_path), max_width)
@@ -0,0 +1,98 @@
+import time
+
+import cv2
+import numpy as np
+
+from .image_hashing import dhash, gray_histogram, hamming_distance
+
+# Defaults for detect_scenes
+SCENE_SETTINGS = {
+    "sample_every_seconds": 0.5,  # how often a frame is analysed
+    "analysis_width": 160,        # frames are downsampled to this width before comparing
+    "hash_threshold": 10,         # dHash bits (of 64) that must change between samples
+    "histogram_threshold": 0.25,  # or share of grey levels that must move (0-1)
+    "min_scene_seconds": 2.0,     # changes closer together than this are merged
+}
+
+
+def frame_difference(previous, current):
+    """Return (hash distance, histogram distance) between two analysed samples."""
+    hash_distance = hamming_distance(previous["hash"], current["hash"])
+    histogram_distance = float(np.abs(previous["histogram"] - current["histogram"]).sum() / 2)
+    return hash_distance, histogram_distance
+
+
+def detect_scenes(video_path, settings=None, on_progress=None):
+    """
+    Propose one frame per scene (e.g. per slide) in a single streaming pass over a video.
+
+    Every sampled frame is downsampled and reduced to a dHash and a grey-level histogram, and compared
+    with the previous sample. After a change, the first sample that matches its predecessor again
+    (the transition has settled) becomes the candidate, so fades and slide animations are skipped.
+    Only two samples are held in memory at once.
+
+    Parameters:
+        video_path (str): Path of the video file.
+        settings (dict): Overrides for SCENE_SETTINGS.
+        on_progress (callable): Called as on_progress(fraction_done) while scanning.
+
+    Returns:
+        tuple: (candidates, stats). candidates is a list of {"frame_number", "timestamp", "score"};
+        stats holds "frames", "samples", "seconds" and "frames_per_second".
+    """
+    settings = {**SCENE_SETTINGS, **(settings or {})}
+    capture = cv2.VideoCapture(video_path)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    sample_every = max(1, int(round(fps * settings["sample_every_seconds"])))
+    min_gap = int(round(fps * settings["min_scene_seconds"]))
+
+    def is_change(distances):
+        return distances[0] >= settings["hash_threshold"] or distances[1] >= settings["histogram_threshold"]
+
+    started = time.perf_counter()
+    candidates = []
+    previous = None
+    pending_score = 0  # > 0 while a detected change is waiting to settle
+    frame_number = 0
+    samples = 0
+    try:
+        # grab() decodes without converting; only sampled frames are retrieved
+        while capture.grab():
+            if frame_number % sample_every == 0:
+                ret, frame = capture.retrieve()
+                if not ret:
+                    break
+                height, width = frame.shape[:2]
+                analysis_height = max(1, int(height * settings["analysis_width"] / width))
+                small = cv2.resize(frame, (settings["analysis_width"], analysis_height), interpolation=cv2.INTER_AREA)
+                sample = {"frame_number": frame_number, "hash": dhash(small), "histogram": gray_histogram(small)}
+                samples += 1
+
+                if previous is None:
+                    candidates.append({"frame_number": frame_number, "timestamp": frame_number / fps, "score": 1.0})
+                else:
+                    distances = frame_difference(previous, sample)
+                    score = max(distances[0] / 64, distances[1])
+                    if is_change(distances):
+                        pending_score = max(pending_score, score)
+                    elif pending_score and frame_number - candidates[-1]["frame_number"] >= min_gap:
+                        candidates.append({"frame_number": frame_number, "timestamp": frame_number / fps,
+                                           "score": round(pending_score, 3)})
+                        pending_score = 0
+                previous = sample
+
+                if on_progress and total_frames:
+                    on_progress(min(1.0, frame_number / total_frames))
+            frame_number += 1
+    finally:
+        capture.release()
+
+    seconds = time.perf_counter() - started
+    stats = {
+        "frames": frame_number,
+        "samples": samples,
+        "seconds": seconds,
+        "frames_per_second": frame_number / seconds if seconds > 0 else 0.0,
+    }
+    return candidates, stats
@@ -0,0 +1,165 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+from .file_io import atomic_write
+from .image_hashing import DUPLICATE_DISTANCE
+
+DATABASE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database")
+SETTINGS_FILE = "default.json"
+PROMPTS_DIR = "prompts"
+# Files are checked for changes (one stat each) at most this often
+CHECK_INTERVAL = 2.0
+
+# Saved workspace settings, as stored in database/default.json
+Settings = namedtuple("Settings", ["frame_increment", "stroke_slider", "stroke_color",
+                                   "dedupe_enabled", "dedupe_distance"])
+SETTINGS_DEFAULTS = Settings(frame_increment=1, stroke_slider=3, stroke_color="#00FF00",
+                             dedupe_enabled=True, dedupe_distance=DUPLICATE_DISTANCE)
+# Inclusive ranges of the integer settings (the limits of their widgets)
+SETTINGS_RANGES = {"frame_increment": (1, 100), "stroke_slider": (1, 25), "dedupe_distance": (0, 20)}
+COLOR_PATTERN = re.compile(r"^#[0-9a-fA-F]{6}$")
+
+
+class PromptProfile(namedtuple("PromptProfile", ["category", "name", "prompt", "max_words"])):
+    """A GPT-4o prompt from database/prompts/<category>.json; %MAX_WORDS% is filled in by render()."""
+
+    def render(self, max_words=None):
+        return self.prompt.replace("%MAX_WORDS%", str(max_words or self.max_words))
+
+
+def validate_settings(data):
+    """Return a Settings from a parsed settings file; missing keys take their defaults. Raises ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError("settings must be a JSON object")
+    values = SETTINGS_DEFAULTS._replace(**{key: data[key] for key in Settings._fields if key in data})
+    for key, (low, high) in SETTINGS_RANGES.items():
+        value = getattr(values, key)
+        if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+            raise ValueError(f"'{key}' must be an integer from {low} to {high}, not {value!r}")
+    if not isinstance(values.stroke_color, str) or not COLOR_PATTERN.match(values.stroke_color):
+        raise ValueError(f"'stroke_color' must be a #RRGGBB colour, not {values.stroke_color!r}")
+    if not isinstance(values.dedupe_enabled, bool):
+        raise ValueError(f"'dedupe_enabled' must be true or false, not {values.dedupe_enabled!r}")
+    return values
+
+
+def validate_prompt(category, data):
+    """Return a PromptProfile from a parsed prompt file. Raises ValueError."""
+    if not isinstance(data, dict) or not isinstance(data.get("prompt"), str) or not data["prompt"].strip():
+        raise ValueError("a prompt profile needs a non-empty 'prompt'")
+    return PromptProfile(category=category, name=str(data.get("name", category)), prompt=data["prompt"],
+                         max_words=str(data.get("max_words", "20")))
+
+
+class SettingsRepository:
+    """
+    Process-wide cache of the saved settings and the prompt profiles.
+
+    Each file is parsed and validated once, then served from memory; a file is read again only when its
+    modification time or size changes, which is checked at most every CHECK_INTERVAL seconds. Reruns of
+    the app therefore neither open nor parse JSON. Invalid files raise ValueError naming the file.
+    """
+
+    def __init__(self, database_dir=DATABASE_DIR, check_interval=CHECK_INTERVAL):
+        self.settings_path = os.path.join(database_dir, SETTINGS_FILE)
+        self.prompts_dir = os.path.join(database_dir, PROMPTS_DIR)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._cache = {}  # path -> [signature, value, error, last checked]
+
+    def _load(self, path, read):
+        """Return read(path) for a file, re-running it only after the file changed; 'read' is given None if it is missing."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(path)
+            if entry is None or now - entry[3] >= self.check_interval:
+                try:
+                    stat = os.stat(path)
+                    signature = (stat.st_mtime_ns, stat.st_size)
+                except FileNotFoundError:
+                    signature = None
+                if entry is None or entry[0] != signature:
+                    value, error = None, None
+                    try:
+                        value = read(path if signature is not None else None)
+                    except ValueError as e:
+                        error = ValueError(f"{os.path.basename(path)}: {e}")
+                    entry = [signature, value, error, now]
+                    self._cache[path] = entry
+                entry[3] = now
+        if entry[2] is not None:
+            raise entry[2]
+        return entry[1]
+
+    def settings(self):
+        """Return the saved Settings (the defaults when nothing is saved). The same object is returned until the file changes."""
+        return self._load(self.settings_path, _read_settings)
+
+    def save_settings(self, **values):
+        """Validate and write settings; keys not given keep their saved values."""
+        settings = validate_settings(dict(self.settings()._asdict(), **values))
+        atomic_write(self.settings_path, json.dumps(settings._asdict(), indent=4).encode("utf-8"))
+        with self._lock:
+            self._cache.pop(self.settings_path, None)
+        return settings
+
+    def prompt_categories(self):
+        """Return the categories that have a prompt file, sorted."""
+        return self._load(self.prompts_dir, _list_prompts)
+
+    def prompt(self, category):
+        """Return the PromptProfile of a category. Raises ValueError for an unknown category or invalid file."""
+        if category not in self.prompt_categories():
+            raise ValueError(f"Unknown prompt category: {category}")
+        path = os.path.join(self.prompts_dir, f"{category}.json")
+        return self._load(path, lambda p: validate_prompt(category, _read_json(p)))
+
+    def prompts(self):
+        """Return {category: PromptProfile} of every valid prompt file."""
+        profiles = {}
+        for category in self.prompt_categories():
+            try:
+                profiles[category] = self.prompt(category)
+            except ValueError:
+                continue
+        return profiles
+
+
+def _read_json(path):
+    if path is None:
+        raise ValueError("file not found")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except OSError as e:
+        raise ValueError(f"could not be read ({e})") from None
+    except json.JSONDecodeError as e:
+        raise ValueError(f"invalid JSON ({e})") from None
+
+
+def _read_settings(path):
+    return SETTINGS_DEFAULTS if path is None else validate_settings(_read_json(path))
+
+
+def _list_prompts(path):
+    # A directory's mtime changes when files are added, removed or renamed in it
+    if path is None:
+        return ()
+    return tuple(sorted(os.path.splitext(name)[0] for name in os.listdir(path) if name.endswith(".json")))
+
+
+_repository = None
+_repository_lock = threading.Lock()
+
+
+def get_repository():
+    """Return the SettingsRepository shared by every session of the app."""
+    global _repository
+    with _repository_lock:
+        if _repository is None:
+            _repository = SettingsRepository()
+        return _repository
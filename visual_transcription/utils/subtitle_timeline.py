@@ -0,0 +1,138 @@
+import bisect
+from heapq import merge
+
+
+class SubtitleTimeline:
+    """
+    Subtitle cues and inserted visual transcripts on one timeline.
+
+    Cues are kept in parallel arrays sorted by start time, so the cue showing at any timestamp is found
+    by binary search. Visual transcripts are kept in their own sorted arrays and inserted with bisect.
+    The combined chronological transcript is built once by merging the two sorted sequences, then kept
+    up to date entry by entry as visual transcripts and cue texts change; 'version' is bumped on every
+    change so callers can cache work derived from it.
+    """
+
+    def __init__(self, cues=()):
+        self.starts, self.ends, self.texts = [], [], []
+        self.visual_times, self.visual_frames, self.visual_texts = [], [], []
+        self._visual_time_of = {}  # frame_number -> timestamp
+        self.version = 0
+        self._merged = None  # combined transcript entries, or None until entries() is called
+        self._merged_times = []
+        for start, end, text in cues:
+            self.add_cue(start, end, text)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _changed(self, rebuild=True):
+        self.version += 1
+        if rebuild:
+            self._merged = None
+
+    # Subtitle cues
+    def add_cue(self, start, end, text):
+        """Insert a cue; cues arriving in start order (as in a caption file) are appended."""
+        index = bisect.bisect_right(self.starts, start)
+        self.starts.insert(index, start)
+        self.ends.insert(index, end)
+        self.texts.insert(index, text)
+        self._changed()
+        return index
+
+    def replace_cues(self, cues):
+        """Replace every subtitle cue, keeping the inserted visual transcripts."""
+        self.starts, self.ends, self.texts = [], [], []
+        for start, end, text in cues:
+            self.add_cue(start, end, text)
+        self._changed()
+
+    def cues(self):
+        """Iterate over the cues as (start, end, text) in chronological order."""
+        return zip(self.starts, self.ends, self.texts)
+
+    def cue_at(self, timestamp):
+        """Return the index of the cue showing at 'timestamp' (seconds), or None between cues."""
+        index = bisect.bisect_right(self.starts, timestamp) - 1
+        if index >= 0 and timestamp < self.ends[index]:
+            return index
+        return None
+
+    def cue_for_frame(self, frame_number, fps):
+        """Return the index of the cue showing on a video frame, or None."""
+        if not fps or fps <= 0:
+            return None
+        return self.cue_at(frame_number / fps)
+
+    def set_cue_text(self, index, text):
+        self.texts[index] = text
+        if self._merged is not None:
+            # Cues sharing a start time sit in cue order ahead of any visual entry at that time
+            start = self.starts[index]
+            position = bisect.bisect_left(self._merged_times, start) + index - bisect.bisect_left(self.starts, start)
+            self._merged[position] = (start, text, "audio")
+        self._changed(rebuild=False)
+
+    # Visual transcripts
+    def _visual_index(self, frame_number, timestamp):
+        index = bisect.bisect_left(self.visual_times, timestamp)
+        while index < len(self.visual_times) and self.visual_times[index] == timestamp:
+            if self.visual_frames[index] == frame_number:
+                return index
+            index += 1
+        return None
+
+    def has_visual(self, frame_number):
+        return frame_number in self._visual_time_of
+
+    def visual_time(self, frame_number):
+        """Return the timestamp a frame's visual transcript was inserted at, or None."""
+        return self._visual_time_of.get(frame_number)
+
+    def visuals(self):
+        """Iterate over the visual transcripts as (timestamp, frame_number, text) in chronological order."""
+        return zip(self.visual_times, self.visual_frames, self.visual_texts)
+
+    def insert_visual(self, frame_number, timestamp, text):
+        """Insert (or replace) the visual transcript of a frame at 'timestamp' seconds."""
+        self.remove_visual(frame_number)
+        index = bisect.bisect_right(self.visual_times, timestamp)
+        self.visual_times.insert(index, timestamp)
+        self.visual_frames.insert(index, frame_number)
+        self.visual_texts.insert(index, text)
+        self._visual_time_of[frame_number] = timestamp
+        if self._merged is not None:
+            position = bisect.bisect_right(self._merged_times, timestamp)
+            self._merged_times.insert(position, timestamp)
+            self._merged.insert(position, (timestamp, text, "visual", frame_number))
+        self._changed(rebuild=False)
+
+    def remove_visual(self, frame_number):
+        """Remove a frame's visual transcript; returns its timestamp, or None if it was not inserted."""
+        timestamp = self._visual_time_of.pop(frame_number, None)
+        if timestamp is None:
+            return None
+        index = self._visual_index(frame_number, timestamp)
+        del self.visual_times[index], self.visual_frames[index], self.visual_texts[index]
+        if self._merged is not None:
+            position = bisect.bisect_left(self._merged_times, timestamp)
+            while self._merged[position][2:] != ("visual", frame_number):
+                position += 1
+            del self._merged_times[position], self._merged[position]
+        self._changed(rebuild=False)
+        return timestamp
+
+    def entries(self):
+        """
+        Return the combined transcript in chronological order: (timestamp, text, "audio") for cues and
+        (timestamp, text, "visual", frame_number) for visual transcripts. At equal times cues come first.
+        The list is updated in place by later changes and must not be modified by the caller.
+        """
+        if self._merged is None:
+            audio = ((start, text, "audio") for start, text in zip(self.starts, self.texts))
+            visual = ((timestamp, text, "visual", frame_number) for timestamp, text, frame_number
+                      in zip(self.visual_times, self.visual_texts, self.visual_frames))
+            self._merged = list(merge(audio, visual, key=lambda entry: entry[0]))
+            self._merged_times = [entry[0] for entry in self._merged]
+        return self._merged
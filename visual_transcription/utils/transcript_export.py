@@ -0,0 +1,91 @@
+import io
+from heapq import merge
+
+from docx import Document
+
+# How long a visual transcript stays on screen in SRT/WebVTT output
+VISUAL_CUE_SECONDS = 4.0
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def format_timestamp(seconds, separator=","):
+    """Format seconds as HH:MM:SS,mmm (SRT) or, with separator=".", HH:MM:SS.mmm (WebVTT)."""
+    milliseconds = int(round(max(0.0, seconds) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
+
+
+def timed_entries(timeline):
+    """
+    Yield the transcript as (start, end, text, frame_number) in chronological order; frame_number is
+    None for subtitle cues. Visual transcripts are shown for VISUAL_CUE_SECONDS.
+    """
+    audio = ((start, end, text, None) for start, end, text in timeline.cues())
+    visual = ((timestamp, timestamp + VISUAL_CUE_SECONDS, f"[Visual] {text}", frame_number)
+              for timestamp, frame_number, text in timeline.visuals())
+    return merge(audio, visual, key=lambda entry: entry[0])
+
+
+def render_docx(timeline):
+    doc = Document()
+    doc.add_heading("Visual Transcript", level=1)
+    doc.add_paragraph("This document contains both audio transcripts and visual descriptions in chronological order.")
+    doc.add_paragraph("Timestamps are shown in seconds from the start of the video.")
+    for entry in timeline.entries():
+        para = doc.add_paragraph()
+        if len(entry) == 3:  # Audio entry (timestamp, text, "audio")
+            timestamp, text, _ = entry
+            para.add_run(f"[{timestamp:.2f}s] ").bold = True
+            para.add_run(text)
+        else:  # Visual entry (timestamp, text, "visual", frame_number)
+            timestamp, text, _, frame_number = entry
+            para.add_run(f"[{timestamp:.2f}s - Frame {frame_number}] ").bold = True
+            para.add_run(f"Visual Description: {text}").italic = True
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def render_srt(timeline):
+    blocks = [f"{number}\n{format_timestamp(start)} --> {format_timestamp(end)}\n{text}\n"
+              for number, (start, end, text, _) in enumerate(timed_entries(timeline), start=1)]
+    return "\n".join(blocks).encode("utf-8")
+
+
+def render_vtt(timeline):
+    blocks = ["WEBVTT\n"]
+    blocks += [f"{format_timestamp(start, '.')} --> {format_timestamp(end, '.')}\n{text}\n"
+               for start, end, text, _ in timed_entries(timeline)]
+    return "\n".join(blocks).encode("utf-8")
+
+
+# format -> (renderer, MIME type, file extension)
+EXPORT_FORMATS = {
+    "docx": (render_docx, DOCX_MIME, "docx"),
+    "srt": (render_srt, "application/x-subrip", "srt"),
+    "vtt": (render_vtt, "text/vtt", "vtt"),
+}
+
+
+class TranscriptExporter:
+    """
+    Renders a SubtitleTimeline to DOCX, SRT and WebVTT bytes in memory.
+
+    Each format is re-rendered only when the timeline has changed since it was last rendered (its
+    version counter moved, or it was replaced), so reruns that change nothing reuse the bytes.
+    """
+
+    def __init__(self):
+        self._cache = {}  # format -> (timeline, version, bytes)
+
+    def export(self, timeline, export_format):
+        """Return (data, mime, extension) of the timeline in 'export_format' ("docx", "srt" or "vtt")."""
+        renderer, mime, extension = EXPORT_FORMATS[export_format]
+        cached = self._cache.get(export_format)
+        if cached is None or cached[0] is not timeline or cached[1] != timeline.version:
+            cached = (timeline, timeline.version, renderer(timeline))
+            self._cache[export_format] = cached
+        return cached[2], mime, extension
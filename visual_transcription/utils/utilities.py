@@ -1,7 +1,6 @@
 import cv2
-from io import BytesIO
-import base64
 import streamlit as st
+from .image_encoding import image_to_base64
 def get_frame_timestamp(frame_index, video_capture):
     """
     Given a frame index and a cv2.VideoCapture object, this function calculates
@@ -27,18 +26,6 @@ def get_frame_timestamp(frame_index, video_capture):
     # Format timestamp as HH:MM:SS.ss
     return f"{hours:02d}:{minutes:02d}:{secs:05.2f}"
 
-# -----------------------------------------------
-# Helper Function: Convert a NumPy image to Base64
-# -----------------------------------------------
-def image_to_base64(image):
-    buffered = BytesIO()
-    from PIL import Image
-    pil_image = Image.fromarray(image)
-    pil_image.save(buffered, format="JPEG")
-    return base64.b64encode(buffered.getvalue()).decode()
-
-
-
 # -----------------------------------------------
 # Set Up the Streamlit App
 # -----------------------------------------------
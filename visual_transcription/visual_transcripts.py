@@ -3,15 +3,23 @@ import cv2
 import numpy as np
 import os
 import tempfile
-import base64
-import requests
-import json
 import glob
 from PIL import Image
 from openai import OpenAI
-from docx import Document
 from streamlit_drawable_canvas import st_canvas
 from dotenv import load_dotenv
+from utils.frame_server import FrameServer
+from utils.scene_detection import detect_scenes
+from src.api_calls import transcribe_frame, transcribe_frames
+from utils.image_encoding import thumbnail_base64
+from utils.image_hashing import DUPLICATE_DISTANCE, HashIndex, dhash, find_duplicates
+from utils.subtitle_timeline import SubtitleTimeline
+from utils.captions import parse_captions
+from utils.proxy_video import discard_proxy_job, open_proxy, remove_proxy, start_proxy
+from utils.cropping import crop_polygon, path_points, rect_points
+from utils.transcript_export import TranscriptExporter
+from utils.project_store import build_project, delete_project, hash_file, load_project, save_project
+from utils.settings_store import get_repository
 
 # Set Streamlit theme - Must be the first Streamlit command
 st.set_page_config(page_title="VT Generator", page_icon="🖼️", layout="wide")
@@ -24,16 +32,6 @@ client = OpenAI(api_key=GPT_API_KEY)
 # --- Helper Functions ---
 # The line below was causing a NameError - removing or properly commenting it
 
-# Define minimal fallback functions if needed
-def image_to_base64(image):
-    """Convert PIL image or numpy array to base64 string."""
-    if isinstance(image, np.ndarray):
-        image = Image.fromarray(image)
-    buffered = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
-    image.save(buffered, format="JPEG")
-    with open(buffered.name, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
-
 def get_frame_timestamp(frame_number, video_obj):
     """Get timestamp for a frame."""
     if video_obj and video_obj.isOpened():
@@ -43,253 +41,182 @@ def get_frame_timestamp(frame_number, video_obj):
             return seconds
     return 0
 
-# Function to encode image as base64
-def encode_image(image):
-    buffered = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
-    image.save(buffered, format="JPEG")
-    with open(buffered.name, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
-
-# Function to parse SRT files
-def parse_srt(file):
-    subtitles = {}
-    lines = file.read().decode("utf-8").split("\n")
-    index, start_time = None, None
-    for line in lines:
-        line = line.strip()
-        if line.isdigit():
-            index = int(line)
-        elif "-->" in line:
-            start_time = line.split(" --> ")[0]
-            start_time = sum(float(x) * 60 ** i for i, x in enumerate(reversed(start_time.replace(',', '.').split(':'))))
-        elif line:
-            if index is not None and start_time is not None:
-                subtitles[start_time] = line
-    return subtitles
-
-# --- Cropping Logic Functions ---
-def crop_rectangular(image_cv_bgr, rect_data):
-    """Crops the OpenCV BGR image using rectangle data."""
-    left = int(rect_data['left'])
-    top = int(rect_data['top'])
-    width = int(rect_data['width'])
-    height = int(rect_data['height'])
-    if width <= 0 or height <= 0:
-        st.warning("Please draw a valid rectangle.")
-        return None
-    h_img, w_img = image_cv_bgr.shape[:2]
-    x1, y1 = max(0, left), max(0, top)
-    x2, y2 = min(w_img, left + width), min(h_img, top + height)
-    if x2 <= x1 or y2 <= y1:
-         st.warning("Calculated crop area is outside image bounds or invalid.")
-         return None
-    cropped_bgr = image_cv_bgr[y1:y2, x1:x2]
-    return cropped_bgr
-
-def crop_freeform(image_cv_bgr, path_data):
-    """Crops the OpenCV BGR image using freeform path data."""
-    if not path_data:
-         st.warning("Received empty path data.")
-         return None
-    
-    # Get image dimensions for boundary validation
-    h_img, w_img = image_cv_bgr.shape[:2]
-    
-    points_list = []
-    for point_cmd in path_data:
-        if len(point_cmd) >= 3:
-            try:
-                # Extract coordinates
-                x = int(float(point_cmd[-2]))
-                y = int(float(point_cmd[-1]))
-                
-                # Clip coordinates to image boundaries
-                x = max(0, min(x, w_img - 1))
-                y = max(0, min(y, h_img - 1))
-                
-                # Add the valid point to our list
-                points_list.append([x, y])
-            except (ValueError, IndexError, TypeError):
-                # Skip invalid point data silently
-                continue
+# Perceptual hash of a saved frame, computed once and kept in its entry (re-saving a frame replaces it)
+def frame_hash(frame_info):
+    if frame_info.get('hash') is None:
+        frame_info['hash'] = dhash(frame_info['frame'])
+    return frame_info['hash']
 
-    # Ensure we have enough points to form a shape
-    if len(points_list) < 3:
-         st.warning("Not enough valid points to create a crop area. Please try again.")
-         return None
-    
+def transcribed_frame_hashes():
+    """Return {frame_number: hash} of every saved frame that already has a transcription."""
+    return {n: frame_hash(info) for n, info in st.session_state.saved_frames.items()
+            if info.get('has_visual_transcripts', False) and info.get('frame') is not None}
+
+def store_transcription(frame_number, transcription, reused_from=None):
+    """Record a frame's transcription; 'reused_from' names the near-duplicate frame it was copied from."""
+    frame_info = st.session_state.saved_frames[frame_number]
+    frame_info['visual_transcripts'] = transcription
+    frame_info['has_visual_transcripts'] = True
+    frame_info['reused_from'] = reused_from
+    st.session_state["transcriptions"][frame_number] = transcription
+    if reused_from is not None:
+        st.session_state["api_calls_saved"] += 1
+    if st.session_state.get('video') and st.session_state.video.isOpened():
+        try:
+            frame_info['time_stamp'] = get_frame_timestamp(frame_number, st.session_state.video)
+        except Exception as ts_error:
+            st.warning(f"Could not get timestamp for Frame {frame_number}: {ts_error}")
+            frame_info['time_stamp'] = "N/A"
+
+def navigation_video():
+    """
+    Return the video used for navigation and crop previews: the low-resolution proxy once its background
+    transcode has finished, otherwise the full-resolution video.
+    """
+    job = st.session_state.get("proxy_job")
+    if st.session_state.get("proxy") is None and job is not None and job.done():
+        st.session_state.proxy_job = None
+        try:
+            st.session_state.proxy = open_proxy(job.result()['path'])
+        except Exception as e:
+            st.warning(f"Could not prepare the preview video; using the full-resolution video instead: {e}")
+    return st.session_state.get("proxy") or st.session_state.video
+
+def release_proxy():
+    """Close and delete the proxy video, and abandon its transcode (deleting its output if it already started)."""
+    discard_proxy_job(st.session_state.get("proxy_job"))
+    if st.session_state.get("proxy") is not None:
+        st.session_state.proxy.release()
+        remove_proxy(st.session_state.proxy.path)
+    st.session_state.proxy_job = None
+    st.session_state.proxy = None
+
+def frame_time(frame_number):
+    """Timestamp (s) of a frame on the subtitle timeline; 30 fps is assumed when no video is open."""
+    video_obj = st.session_state.get('video')
+    if video_obj and video_obj.isOpened() and video_obj.get(cv2.CAP_PROP_FPS) > 0:
+        return get_frame_timestamp(frame_number, video_obj)
+    return float(frame_number) / 30.0
+
+def restore_project(project, video_obj):
+    """
+    Rebuild the workspace of a saved project without any API calls: transcriptions, inserted transcripts
+    and subtitle cues come from the project, and saved frames are decoded again from the video by frame
+    number (with their crop re-applied). Returns the number of frames restored.
+    """
+    saved_frames = {}
+    for frame_number in sorted(project["frames"]):
+        record = project["frames"][frame_number]
+        frame_bgr = video_obj.read_frame(frame_number, prefetch=False)
+        if frame_bgr is None:
+            continue
+        if record.get('is_cropped') and record.get('crop_points'):
+            frame_bgr = crop_polygon(frame_bgr, np.array(record['crop_points'], dtype=np.float64))
+        saved_frames[frame_number] = dict(record, frame=cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB),
+                                          getting_visual_transcripts=False)
+    st.session_state.saved_frames = saved_frames
+    st.session_state.transcriptions = project["transcriptions"]
+    st.session_state.inserted_transcriptions = project["inserted_transcriptions"]
+    return len(saved_frames)
+
+def persist_project():
+    """Write the workspace to the project store of the open video; unchanged workspaces are not rewritten."""
+    if st.session_state.get("project_id") is None:
+        return
+    project = build_project(st.session_state.saved_frames, st.session_state.transcriptions,
+                            st.session_state.inserted_transcriptions, st.session_state.timeline,
+                            {"total_frames": st.session_state.total_frames})
     try:
-        # Convert to numpy array for OpenCV
-        contour = np.array(points_list, dtype=np.int32)
-        
-        # Create a mask with only the points inside the image
-        mask = np.zeros(image_cv_bgr.shape[:2], dtype=np.uint8)
-        cv2.drawContours(mask, [contour], -1, color=255, thickness=cv2.FILLED)
-        
-        # Apply the mask
-        masked_image_bgr = cv2.bitwise_and(image_cv_bgr, image_cv_bgr, mask=mask)
-        
-        # Calculate bounding rectangle
-        x_bb, y_bb, w_bb, h_bb = cv2.boundingRect(contour)
-        
-        # Validate bounding box dimensions
-        if w_bb <= 0 or h_bb <= 0:
-            st.warning("Freeform crop area resulted in an empty image. Please try a larger selection.")
-            return None
-            
-        # Ensure bounding box is within image boundaries
-        x_bb = max(0, x_bb)
-        y_bb = max(0, y_bb)
-        w_bb = min(w_bb, w_img - x_bb)
-        h_bb = min(h_bb, h_img - y_bb)
-        
-        # Final validation of crop area
-        if w_bb <= 0 or h_bb <= 0:
-            st.warning("Crop area is outside image boundaries. Please try again.")
-            return None
-            
-        # Extract the bounded region
-        cropped_bgr = masked_image_bgr[y_bb:y_bb+h_bb, x_bb:x_bb+w_bb]
-        return cropped_bgr
-    
-    except Exception as e:
-        st.error(f"Error during freeform cropping: {e}")
-        return None
+        st.session_state.project_saved = save_project(st.session_state.project_id, project,
+                                                      st.session_state.saved_frames,
+                                                      st.session_state.get("project_saved"))
+    except OSError as e:
+        st.warning(f"Could not save the project: {e}")
 
-# Function to get list of users from the database directory
+# Stream the cues of an uploaded SRT/WebVTT file into the timeline as (start, end, text)
+def caption_cues(file):
+    return ((cue.start, cue.end, cue.text) for cue in parse_captions(file))
+
+# Apply the saved settings to the session; they are cached per process, so reruns do not touch the file
 def get_settings():
-    """Load default settings from file if available, otherwise return defaults"""
-    settings_path = "visual_transcription/database/default.json"
+    """Load saved settings into the session when they are new to it (first run, or the file changed)"""
     try:
-        if os.path.exists(settings_path):
-            with open(settings_path, 'r') as f:
-                settings = json.load(f)
-                
-            # Load navigation settings
-            if 'frame_increment' in settings:
-                st.session_state.frame_increment = settings['frame_increment']
-                
-            # Load drawing settings
-            if 'stroke_slider' in settings:
-                st.session_state.stroke_slider = settings['stroke_slider']
-            if 'stroke_color' in settings:
-                st.session_state.stroke_color = settings['stroke_color']
-    except Exception as e:
+        settings = get_repository().settings()
+    except ValueError as e:
         st.error(f"Error loading settings: {e}")
         # Use defaults if settings can't be loaded
+        return
+    if st.session_state.get("applied_settings") is settings:
+        return
+    st.session_state.applied_settings = settings
+    # Navigation, drawing and near-duplicate settings
+    st.session_state.frame_increment = settings.frame_increment
+    st.session_state.stroke_slider = settings.stroke_slider
+    st.session_state.stroke_color = settings.stroke_color
+    st.session_state.dedupe_enabled = settings.dedupe_enabled
+    st.session_state.dedupe_distance = settings.dedupe_distance
 
 def save_settings():
     """Save current settings to default file"""
-    # Create the directory if it doesn't exist
-    os.makedirs("visual_transcription/database", exist_ok=True)
-    
-    settings_path = "visual_transcription/database/default.json"
     try:
-        # Create a settings dictionary with just navigation and drawing settings
-        settings = {
-            'frame_increment': st.session_state.get('frame_increment', 1),
-            'stroke_slider': st.session_state.get('stroke_slider', 3),
-            'stroke_color': st.session_state.get('stroke_color', '#00FF00')
-        }
-        
-        with open(settings_path, 'w') as f:
-            json.dump(settings, f, indent=4)
-        
+        st.session_state.applied_settings = get_repository().save_settings(
+            frame_increment=st.session_state.get('frame_increment', 1),
+            stroke_slider=st.session_state.get('stroke_slider', 3),
+            stroke_color=st.session_state.get('stroke_color', '#00FF00'),
+            dedupe_enabled=st.session_state.get('dedupe_enabled', True),
+            dedupe_distance=st.session_state.get('dedupe_distance', DUPLICATE_DISTANCE)
+        )
         return True
     except Exception as e:
         st.error(f"Error saving settings: {e}")
         return False
 
+def load_prompt(category):
+    """Use the prompt profile of a category for GPT-4o, filled in with the current max words; returns the profile"""
+    profile = get_repository().prompt(category)
+    st.session_state['gpt-4o'] = {
+        "prompt": profile.render(st.session_state["max_words"]),
+        "max_words": st.session_state["max_words"]
+    }
+    return profile
+
 # Download full transcript
 def download_transcript():
-    doc = Document()
-    doc.add_heading("Visual Transcript", level=1)
-    
-    # Use the merged transcripts for a more comprehensive document
-    merged_transcripts = merge_transcripts()
-    
-    if merged_transcripts:
-        # Add a section explaining the format
-        doc.add_paragraph("This document contains both audio transcripts and visual descriptions in chronological order.")
-        doc.add_paragraph("Timestamps are shown in seconds from the start of the video.")
-        
-        # Add all merged transcripts in chronological order
-        for entry in merged_transcripts:
-            if len(entry) == 3:  # Audio entry (timestamp, text, "audio")
-                timestamp, text, source = entry
-                para = doc.add_paragraph()
-                para.add_run(f"[{timestamp:.2f}s] ").bold = True
-                para.add_run(f"{text}")
-            else:  # Visual entry (timestamp, text, "visual", frame_number)
-                timestamp, text, source, frame_number = entry
-                para = doc.add_paragraph()
-                para.add_run(f"[{timestamp:.2f}s - Frame {frame_number}] ").bold = True
-                para.add_run(f"Visual Description: {text}").italic = True
-    else:
-        # Fall back to original subtitles if no merged transcripts
-        for timestamp, text in st.session_state["subtitles"].items():
-            doc.add_paragraph(f"{timestamp}: {text}")
-    
-    temp_doc_path = tempfile.NamedTemporaryFile(delete=False, suffix=".docx").name
-    doc.save(temp_doc_path)
-    with open(temp_doc_path, "rb") as doc_file:
-        st.sidebar.download_button("Download Transcript", doc_file, file_name="visual_transcript.docx", mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+    """Offer the combined transcript as DOCX, SRT and WebVTT, rendered in memory only after it changes."""
+    exporter = st.session_state.exporter
+    labels = {"docx": "Download Transcript (DOCX)", "srt": "Download Subtitles (SRT)", "vtt": "Download Subtitles (WebVTT)"}
+    for export_format, label in labels.items():
+        data, mime, extension = exporter.export(st.session_state.timeline, export_format)
+        st.sidebar.download_button(label, data, file_name=f"visual_transcript.{extension}", mime=mime,
+                                   key=f"download_{export_format}")
 
 # Function to merge audio and visual transcripts chronologically
 def merge_transcripts():
     """
-    Creates a chronologically ordered combined transcript from both 
-    audio subtitles and visual frame transcriptions.
-    Returns a list of (timestamp, text, source_type) tuples sorted by timestamp.
+    Returns the chronologically ordered combined transcript of audio subtitles and inserted visual
+    frame transcriptions: (timestamp, text, "audio") and (timestamp, text, "visual", frame_number) tuples.
+    The timeline keeps both sorted as they change, so nothing is re-sorted here.
     """
-    combined_entries = []
-    
-    # Add entries from audio transcripts (subtitles)
-    if st.session_state["subtitles"]:
-        for timestamp, text in st.session_state["subtitles"].items():
-            # Handle potential format issues
-            try:
-                combined_entries.append((float(timestamp), text, "audio"))
-            except (ValueError, TypeError):
-                # If timestamp can't be converted to float, use a default
-                st.warning(f"Invalid timestamp format: {timestamp}. Using 0.0 instead.")
-                combined_entries.append((0.0, text, "audio"))
-    
-    # Add entries from visual transcriptions
-    if st.session_state.get("transcriptions") and st.session_state.get("inserted_transcriptions"):
-        # Get video object for timestamp conversion
-        video_obj = st.session_state.get('video')
-        if video_obj and video_obj.isOpened():
-            for frame_number in st.session_state.inserted_transcriptions:
-                if frame_number in st.session_state["transcriptions"]:
-                    # Convert frame number to timestamp
-                    timestamp = get_frame_timestamp(frame_number, video_obj)
-                    transcription = st.session_state["transcriptions"][frame_number]
-                    combined_entries.append((timestamp, transcription, "visual", frame_number))
-        else:
-            # If video isn't available, use placeholder timestamps
-            for frame_number in st.session_state.inserted_transcriptions:
-                if frame_number in st.session_state["transcriptions"]:
-                    # Use frame number as approximate timestamp
-                    transcription = st.session_state["transcriptions"][frame_number]
-                    combined_entries.append((float(frame_number)/30.0, transcription, "visual", frame_number))
-    
-    # Sort by timestamp (first element of each tuple)
-    return sorted(combined_entries, key=lambda x: x[0])
+    return st.session_state.timeline.entries()
 
 # Initialize session state variables
 # Original session state variables
 st.session_state.setdefault("saved_frames", {})
 st.session_state.setdefault("saved_subtitles", [])
 st.session_state.setdefault("frame_index", 0)
-st.session_state.setdefault("frame_subtitle_map", {})
-st.session_state.setdefault("subtitles", {})
+# Subtitle cues and inserted visual transcripts, kept in chronological order
+st.session_state.setdefault("timeline", SubtitleTimeline())
+# Renders the timeline for download, caching each format until the timeline changes
+st.session_state.setdefault("exporter", TranscriptExporter())
 st.session_state.setdefault("transcriptions", {})
 # New session state to track which transcriptions have been inserted into the transcript
 st.session_state.setdefault("inserted_transcriptions", set())
 
 # Additional session state for enhanced features
 st.session_state.setdefault("video", None)
+# Low-resolution copy of the video for scrubbing, generated in the background after upload
+st.session_state.setdefault("proxy", None)
+st.session_state.setdefault("proxy_job", None)
 st.session_state.setdefault("frame_number", 0)
 st.session_state.setdefault("total_frames", 0)
 st.session_state.setdefault("uploaded", False)
@@ -300,6 +227,13 @@ st.session_state.setdefault("show_settings", True)
 st.session_state.setdefault("pending_video_file", None)
 st.session_state.setdefault("stroke_slider", 3)
 st.session_state.setdefault("stroke_color", "#00FF00")
+# Near-duplicate frames reuse an existing transcription instead of calling the API again
+st.session_state.setdefault("dedupe_enabled", True)
+st.session_state.setdefault("dedupe_distance", DUPLICATE_DISTANCE)
+st.session_state.setdefault("api_calls_saved", 0)
+# The workspace is saved on disk per video (keyed by the video's hash) and restored when it is reopened
+st.session_state.setdefault("project_id", None)
+st.session_state.setdefault("project_saved", None)
 # Add active tab tracking
 st.session_state.setdefault("active_tab", 0)  # 0=Settings, 1=Media Upload, 2=Visual Transcription
 # Add flag for showing workspace after video processing
@@ -311,36 +245,10 @@ get_settings()
 # GPT-4o settings
 if "gpt-4o" not in st.session_state:
     try:
-        # First try to load default (general) prompt from new prompt system
-        prompt_file_path = "database/prompts/general.json"
-        if os.path.exists(prompt_file_path):
-            with open(prompt_file_path, "r") as json_file:
-                gpt4o_data = json.load(json_file)
-                st.session_state['gpt-4o'] = {
-                    "prompt": gpt4o_data["prompt"], 
-                    "max_words": st.session_state["max_words"]
-                }
-                # Initial replacement
-                st.session_state['gpt-4o']["prompt"] = st.session_state['gpt-4o']["prompt"].replace(
-                    "%MAX_WORDS%", str(st.session_state["max_words"]))
-        # Fall back to legacy path for backward compatibility
-        elif os.path.exists(r"utils\chat_GPT.json"):
-            with open(r"utils\chat_GPT.json", "r") as json_file:
-                gpt4o_data = json.load(json_file)
-                st.session_state['gpt-4o'] = {
-                    "prompt": gpt4o_data["prompt"], 
-                    "max_words": st.session_state["max_words"]
-                }
-                # Initial replacement
-                st.session_state['gpt-4o']["prompt"] = st.session_state['gpt-4o']["prompt"].replace(
-                    "%MAX_WORDS%", str(st.session_state["max_words"]))
-        else:
-            # Default fallback if no files found
-            st.session_state['gpt-4o'] = {"prompt": "Describe the image in detail.", "max_words": "100"}
-        
+        # Start with the general prompt profile
+        load_prompt("general")
         # Initialize prompt category
         st.session_state.prompt_category = "general"
-            
     except Exception as e:
         st.error(f"Error loading prompt settings: {e}")
         st.session_state['gpt-4o'] = {"prompt": "Describe the image in detail.", "max_words": "100"}
@@ -422,6 +330,15 @@ with settings_tab:
         st.session_state['gpt-4o']["prompt"] = current_prompt.replace(f"{prev_max_words}", f"{current_max_words}")
         st.session_state['gpt-4o']["max_words"] = current_max_words
         current_prompt = st.session_state['gpt-4o']["prompt"]
+
+    # Near-duplicate frames (e.g. the same slide saved twice) share one transcription
+    dedupe_enabled = st.checkbox("Reuse transcriptions for near-duplicate frames",
+                                 value=st.session_state.dedupe_enabled, key='dedupe_enabled_input')
+    st.session_state.dedupe_enabled = dedupe_enabled
+    dedupe_distance = st.slider(
+        "Near-duplicate distance (bits of the 64-bit frame hash that may differ; 0 = identical only)",
+        0, 20, st.session_state.dedupe_distance, key='dedupe_distance_input', disabled=not dedupe_enabled)
+    st.session_state.dedupe_distance = int(dedupe_distance)
     
     # Save settings button
     st.markdown("---")
@@ -438,30 +355,16 @@ with media_tab:
     # Load Audio Transcript if not already loaded
     if not st.session_state.audio_transcript:
         # Replace the old uploader with the SRT file uploader
-        srt_file = st.file_uploader("Upload Subtitle File (SRT)", type=["srt"], key='srt_uploader')
+        srt_file = st.file_uploader("Upload Subtitle File (SRT or WebVTT)", type=["srt", "vtt"], key='srt_uploader')
         if srt_file is not None:
             # Process SRT file immediately if video already loaded 
             if st.session_state.get('uploaded', False) and st.session_state.get('video') is not None:
                 try:
-                    # Save current transcriptions and inserted_transcriptions
-                    saved_transcriptions = st.session_state.get("transcriptions", {})
-                    saved_inserted_transcriptions = st.session_state.get("inserted_transcriptions", set())
-                    
-                    # Parse and process the SRT file
-                    st.session_state["subtitles"] = parse_srt(srt_file)
-                    fps = st.session_state.video.get(cv2.CAP_PROP_FPS)
-                    if fps > 0:
-                        st.session_state["frame_subtitle_map"] = {
-                            int(start_time * fps): text
-                            for start_time, text in st.session_state["subtitles"].items()
-                        }
-                    else:
+                    # Parse the SRT file into the timeline; inserted visual transcripts are kept
+                    st.session_state.timeline.replace_cues(caption_cues(srt_file))
+                    if not st.session_state.video.get(cv2.CAP_PROP_FPS) > 0:
                         st.warning("Could not get FPS from video. Subtitle mapping might be incorrect.")
                     
-                    # Restore saved transcriptions and inserted_transcriptions
-                    st.session_state["transcriptions"] = saved_transcriptions
-                    st.session_state["inserted_transcriptions"] = saved_inserted_transcriptions
-                    
                     st.success("SRT file processed! Visual and audio transcripts will be displayed together.")
                     
                 except Exception as e:
@@ -491,13 +394,17 @@ with media_tab:
             if st.button("Clear Video"):
                 if st.session_state.video is not None:
                     st.session_state.video.release()
+                release_proxy()
                 st.session_state.video = None
                 st.session_state.uploaded = False
                 st.session_state.saved_frames = {}
                 st.session_state.frame_number = 0
                 st.session_state.total_frames = 0
                 st.session_state.pending_video_file = None
-                st.session_state.subtitles = {}
+                st.session_state.timeline.replace_cues([])
+                # The saved project stays on disk and is restored if the video is opened again
+                st.session_state.project_id = None
+                st.session_state.project_saved = None
                 # Keep transcriptions in case user wants to reuse them
                 # st.session_state.transcriptions = {}
                 # st.session_state.inserted_transcriptions = set()
@@ -507,16 +414,21 @@ with media_tab:
             if st.button("Clear Video & Transcriptions"):
                 if st.session_state.video is not None:
                     st.session_state.video.release()
+                release_proxy()
                 st.session_state.video = None
                 st.session_state.uploaded = False
                 st.session_state.saved_frames = {}
                 st.session_state.frame_number = 0
                 st.session_state.total_frames = 0
                 st.session_state.pending_video_file = None
-                st.session_state.subtitles = {}
+                st.session_state.timeline = SubtitleTimeline()
                 # Clear all transcriptions
                 st.session_state.transcriptions = {}
                 st.session_state.inserted_transcriptions = set()
+                if st.session_state.project_id is not None:
+                    delete_project(st.session_state.project_id)
+                st.session_state.project_id = None
+                st.session_state.project_saved = None
                 st.experimental_rerun()
     
     st.markdown("---")
@@ -542,37 +454,42 @@ with media_tab:
                         st.session_state.frame_number = 0 # Reset frame number
                         if st.session_state.video is not None:
                             st.session_state.video.release()
+                        release_proxy()
 
-                        st.session_state.video = cv2.VideoCapture(temp_file_path)
+                        st.session_state.video = FrameServer(temp_file_path)
                         if st.session_state.video.isOpened():
-                            st.session_state.total_frames = int(st.session_state.video.get(cv2.CAP_PROP_FRAME_COUNT))
+                            st.session_state.total_frames = st.session_state.video.total_frames
                             st.session_state.uploaded = True
+                            # Scrubbing uses a small proxy once it is ready; full-resolution frames are
+                            # decoded only for the frames that are saved
+                            st.session_state.proxy_job = start_proxy(temp_file_path)
+                            st.session_state.project_id = hash_file(temp_file_path)
+                            st.session_state.project_saved = None
+                            project = load_project(st.session_state.project_id)
 
                             # Process SRT file if it exists
                             srt_file = st.session_state.get('srt_uploader')
-                            # Save current transcriptions and inserted_transcriptions to restore after SRT processing
-                            saved_transcriptions = st.session_state.get("transcriptions", {})
-                            saved_inserted_transcriptions = st.session_state.get("inserted_transcriptions", set())
-                            
-                            st.session_state["subtitles"] = {} # Ensure subtitles dict exists
-                            st.session_state["frame_subtitle_map"] = {} # Ensure map exists
+                            # Replace the subtitle cues; inserted visual transcripts stay on the timeline
+                            st.session_state.timeline.replace_cues([])
+                            if project is not None:
+                                # Reopening a video restores its saved workspace
+                                timeline = SubtitleTimeline(project["cues"])
+                                for timestamp, frame_number, text in project["visuals"]:
+                                    timeline.insert_visual(frame_number, timestamp, text)
+                                st.session_state.timeline = timeline
+                                try:
+                                    restored = restore_project(project, st.session_state.video)
+                                    st.success(f"Restored {restored} saved frames and "
+                                               f"{len(st.session_state.transcriptions)} transcriptions.")
+                                except Exception as e:
+                                    st.error(f"Could not restore the saved project: {e}")
                             if srt_file is not None:
                                 try:
-                                    st.session_state["subtitles"] = parse_srt(srt_file)
-                                    fps = st.session_state.video.get(cv2.CAP_PROP_FPS)
-                                    if fps > 0:
-                                        st.session_state["frame_subtitle_map"] = {
-                                            int(start_time * fps): text
-                                            for start_time, text in st.session_state["subtitles"].items()
-                                        }
-                                    else:
+                                    st.session_state.timeline.replace_cues(caption_cues(srt_file))
+                                    if not st.session_state.video.get(cv2.CAP_PROP_FPS) > 0:
                                         st.warning("Could not get FPS from video. Subtitle mapping might be incorrect.")
                                 except Exception as e:
                                     st.error(f"Error parsing SRT file: {e}")
-                            
-                            # Restore the saved transcriptions and inserted_transcriptions
-                            st.session_state["transcriptions"] = saved_transcriptions
-                            st.session_state["inserted_transcriptions"] = saved_inserted_transcriptions
 
                             st.session_state.pending_video_file = None
                             st.success(f'Video opened successfully! Total frames: {st.session_state.total_frames}')
@@ -638,18 +555,10 @@ with workspace_tab:
                 selected_category = category_mapping[prompt_category]
                 if st.session_state.prompt_category != selected_category:
                     st.session_state.prompt_category = selected_category
-                    # Load the appropriate prompt from the JSON file
+                    # Load the appropriate prompt profile (cached after the first load)
                     try:
-                        with open(f"database/prompts/{selected_category}.json", "r") as json_file:
-                            prompt_data = json.load(json_file)
-                            st.session_state['gpt-4o'] = {
-                                "prompt": prompt_data["prompt"], 
-                                "max_words": st.session_state["max_words"]
-                            }
-                            # Replace placeholder with actual max words
-                            st.session_state['gpt-4o']["prompt"] = st.session_state['gpt-4o']["prompt"].replace(
-                                "%MAX_WORDS%", str(st.session_state["max_words"]))
-                            st.success(f"Loaded {prompt_data['name']} prompt")
+                        profile = load_prompt(selected_category)
+                        st.success(f"Loaded {profile.name} prompt")
                     except Exception as e:
                         st.error(f"Error loading prompt: {e}")
                 
@@ -666,9 +575,45 @@ with workspace_tab:
                 )
                 
                 st.markdown("---")  # Add separator
+
+                # Propose one frame per scene/slide instead of scrubbing through every frame
+                if st.button("🔍 Detect Scene Changes", key="detect_scenes_button"):
+                    progress_bar = st.progress(0.0)
+                    # The proxy has the same frame numbering and is much cheaper to decode
+                    candidates, scan_stats = detect_scenes(navigation_video().path, on_progress=progress_bar.progress)
+                    progress_bar.empty()
+                    added = 0
+                    for candidate in candidates:
+                        candidate_number = candidate['frame_number']
+                        if candidate_number in st.session_state.saved_frames:
+                            continue
+                        candidate_bgr = video_obj.read_frame(candidate_number, prefetch=False)
+                        if candidate_bgr is None:
+                            continue
+                        st.session_state.saved_frames[candidate_number] = {
+                            'frame': cv2.cvtColor(candidate_bgr, cv2.COLOR_BGR2RGB),
+                            'frame_number': candidate_number,
+                            'is_cropped': False,
+                            'has_visual_transcripts': False,
+                            'getting_visual_transcripts': False,
+                            'visual_transcripts': None,
+                            'time_stamp': candidate['timestamp']
+                        }
+                        added += 1
+                    st.success(f"Found {len(candidates)} scenes and added {added} new frames for review. "
+                               f"Scanned {scan_stats['frames']} frames in {scan_stats['seconds']:.1f}s "
+                               f"({scan_stats['frames_per_second']:.0f} frames/s).")
+
+                st.markdown("---")  # Add separator
                 
-                video_obj.set(cv2.CAP_PROP_POS_FRAMES, st.session_state.frame_number)
-                ret, frame_bgr = video_obj.read()  # Keep original frame in BGR
+                # Navigation and previews use the proxy when it is ready; the full-resolution frame is
+                # decoded only when a frame is saved. Served from the frame cache; treat frame_bgr as read-only
+                preview_obj = navigation_video()
+                if st.session_state.get("proxy_job") is not None:
+                    st.caption("Preparing a low-resolution preview video in the background; "
+                               "navigation uses the full-resolution video until it is ready.")
+                frame_bgr = preview_obj.read_frame(st.session_state.frame_number, st.session_state.frame_increment)
+                ret = frame_bgr is not None
 
                 if ret:
                     # --- Prepare for Canvas ---
@@ -676,14 +621,17 @@ with workspace_tab:
                     frame_rgb = cv2.cvtColor(frame_bgr.copy(), cv2.COLOR_BGR2RGB)
                     pil_image_bg = Image.fromarray(frame_rgb)
 
-                    # Initialize the crop variable to avoid NameError when checking later
-                    current_processed_crop_bgr = None
+                    # The drawn crop as polygon points in full-resolution pixels; it is only applied to the
+                    # full-resolution frame when the frame is saved
+                    current_crop = None
 
                     # --- Canvas Mode and Display ---
                     use_rect_mode = st.checkbox("Use Rectangular Crop Mode", value=True, key='crop_mode_checkbox')
 
-                    # Define canvas dimensions (use frame dimensions)
+                    # Define canvas dimensions (use frame dimensions); crops are mapped to the full-resolution size
                     canvas_height, canvas_width = frame_bgr.shape[:2]
+                    full_width = int(video_obj.get(cv2.CAP_PROP_FRAME_WIDTH)) or canvas_width
+                    full_height = int(video_obj.get(cv2.CAP_PROP_FRAME_HEIGHT)) or canvas_height
                     # Optional: Limit max display size for very large videos
                     display_width = min(canvas_width, 1080)
                     display_height = int(display_width * (canvas_height / canvas_width))  # Maintain exact aspect ratio
@@ -712,31 +660,18 @@ with workspace_tab:
                     # --- Process Canvas Result (no preview, just processing) ---
                     if canvas_result and canvas_result.json_data is not None and canvas_result.json_data.get("objects"):
                         last_object = canvas_result.json_data["objects"][-1]
-                        # Scale factor if canvas size was different from original frame size
-                        scale_x = canvas_width / display_width
-                        scale_y = canvas_height / display_height
-
-                        if use_rect_mode and last_object["type"] == "rect":
-                            # Scale coordinates back to original frame dimensions
-                            scaled_rect_data = {
-                                'left': last_object['left'] * scale_x,
-                                'top': last_object['top'] * scale_y,
-                                'width': last_object['width'] * scale_x,
-                                'height': last_object['height'] * scale_y,
-                            }
-                            current_processed_crop_bgr = crop_rectangular(frame_bgr, scaled_rect_data)
-
-                        elif not use_rect_mode and last_object["type"] == "path":
-                            # Scale path points back to original frame dimensions
-                            original_path_data = []
-                            for point_cmd in last_object["path"]:
-                                scaled_cmd = [point_cmd[0]] # Keep command
-                                # Scale coordinate values
-                                for i in range(1, len(point_cmd)):
-                                    scaled_cmd.append(point_cmd[i] * (scale_x if i % 2 != 0 else scale_y))
-                                original_path_data.append(scaled_cmd)
-
-                            current_processed_crop_bgr = crop_freeform(frame_bgr, original_path_data)
+                        # Scale factor from the canvas to the original (full-resolution) frame size
+                        scale_x = full_width / display_width
+                        scale_y = full_height / display_height
+
+                        # Rectangles and freeform shapes both become polygons scaled to the original frame
+                        try:
+                            if use_rect_mode and last_object["type"] == "rect":
+                                current_crop = rect_points(last_object, (scale_x, scale_y))
+                            elif not use_rect_mode and last_object["type"] == "path":
+                                current_crop = path_points(last_object["path"], (scale_x, scale_y))
+                        except ValueError as shape_error:
+                            st.warning(str(shape_error))
                             
                     # --- Frame Navigation ---
                     st.markdown("---")  # Add separator
@@ -765,7 +700,7 @@ with workspace_tab:
                         st.session_state.frame_number = new_frame_number
                         # Clear transient crop when navigating away
                         try:
-                            current_processed_crop_bgr = None
+                            current_crop = None
                         except:
                             pass
                         # Force rerun to update the display with the new frame
@@ -773,6 +708,9 @@ with workspace_tab:
 
                     # Display both time and frame information
                     st.write(f"Current Time: {current_time:.2f}s (Frame: {st.session_state.frame_number})")
+                    frame_stats = preview_obj.latency_stats()
+                    st.caption(f"Frame load: p50 {frame_stats['p50_ms']:.1f} ms, p95 {frame_stats['p95_ms']:.1f} ms, "
+                               f"cache hits {frame_stats['hit_rate']:.0%} over {frame_stats['requests']} requests")
                     
                     # --- Navigation and Save Buttons ---
                     col1, col2, col3 = st.columns([1, 2, 1])
@@ -785,7 +723,7 @@ with workspace_tab:
                                 st.session_state.frame_number = max(0, new_frame)
                                 # Clear transient crop when navigating away
                                 try:
-                                    current_processed_crop_bgr = None
+                                    current_crop = None
                                 except:
                                     pass
                                 st.experimental_rerun()
@@ -793,20 +731,26 @@ with workspace_tab:
                     with col2:
                         # Save Button
                         if st.button('💾 Save Frame (Crop if Drawn)'):
-                            # Re-get the frame to ensure it's the one displayed
+                            # Decode the displayed frame at full resolution (only saved frames are)
                             video_obj = st.session_state.video
                             if video_obj and video_obj.isOpened():
-                                video_obj.set(cv2.CAP_PROP_POS_FRAMES, st.session_state.frame_number)
-                                ret_save, frame_bgr_save = video_obj.read()
+                                frame_bgr_save = video_obj.read_frame(st.session_state.frame_number, prefetch=False)
+                                ret_save = frame_bgr_save is not None
 
                                 if ret_save:
                                     saved_image_data_rgb = None
                                     is_cropped_flag = False
 
-                                    # Check if there's a crop to use
-                                    if current_processed_crop_bgr is not None and current_processed_crop_bgr.size > 0:
+                                    # Apply the drawn crop, if any, to the full-resolution frame
+                                    cropped_bgr = None
+                                    if current_crop is not None:
+                                        try:
+                                            cropped_bgr = crop_polygon(frame_bgr_save, current_crop)
+                                        except ValueError as crop_error:
+                                            st.warning(str(crop_error))
+                                    if cropped_bgr is not None and cropped_bgr.size > 0:
                                         # Save the cropped version (convert to RGB)
-                                        saved_image_data_rgb = cv2.cvtColor(current_processed_crop_bgr, cv2.COLOR_BGR2RGB)
+                                        saved_image_data_rgb = cv2.cvtColor(cropped_bgr, cv2.COLOR_BGR2RGB)
                                         is_cropped_flag = True
                                         st.success(f"Saving **cropped** frame {st.session_state.frame_number}")
                                     else:
@@ -825,6 +769,8 @@ with workspace_tab:
                                             'frame': frame_copy, # Store RGB numpy array copy
                                             'frame_number': st.session_state.frame_number,
                                             'is_cropped': is_cropped_flag,
+                                            # Kept so the crop can be re-applied when the project is reopened
+                                            'crop_points': current_crop.tolist() if is_cropped_flag else None,
                                             'has_visual_transcripts': False,
                                             'getting_visual_transcripts': False,
                                             'visual_transcripts': None
@@ -834,7 +780,7 @@ with workspace_tab:
                                         st.session_state.canvas_key += 1
                                         
                                         # Clear the crop preview after saving
-                                        current_processed_crop_bgr = None
+                                        current_crop = None
                                         
                                         st.success(f"Saved frame {st.session_state.frame_number}")
                                         st.experimental_rerun()
@@ -854,7 +800,7 @@ with workspace_tab:
                                 st.session_state.frame_number = min(st.session_state.total_frames - 1, new_frame)
                                 # Clear transient crop when navigating away
                                 try:
-                                    current_processed_crop_bgr = None
+                                    current_crop = None
                                 except:
                                     pass
                                 st.experimental_rerun()
@@ -868,6 +814,7 @@ with workspace_tab:
                                 st.session_state.video.release()
                             except:
                                 pass
+                        release_proxy()
                         st.session_state.video = None
                         st.session_state.uploaded = False
                         st.experimental_rerun()
@@ -881,6 +828,7 @@ with workspace_tab:
                     st.session_state.video.release()
                 except:
                     pass
+                release_proxy()
                 st.session_state.video = None
     else:
         # Display a placeholder when no video is uploaded
@@ -903,6 +851,7 @@ with workspace_tab:
                         st.session_state.video.release()
                     except:
                         pass
+                release_proxy()
                 # Reset all video-related state variables
                 st.session_state.video = None
                 st.session_state.uploaded = False
@@ -932,29 +881,14 @@ with workspace_tab:
                     timestamp, text, source, frame_number = entry
                     st.write(f"**[{timestamp:.2f}s - Frame {frame_number}]** 🖼️ *{text}*")
                 
-            # Add a download option for the combined transcript
-            if st.button("Update Combined Transcript Document"):
-                # Create a new document with merged transcripts
-                doc = Document()
-                doc.add_heading("Combined Visual and Audio Transcript", level=1)
-                for entry in merged_transcripts:
-                    if len(entry) == 3:  # Audio entry
-                        timestamp, text, source = entry
-                        doc.add_paragraph(f"[{timestamp:.2f}s] {text}")
-                    else:  # Visual entry
-                        timestamp, text, source, frame_number = entry
-                        doc.add_paragraph(f"[{timestamp:.2f}s - Frame {frame_number}] {text}")
-                
-                # Save and offer for download
-                temp_doc_path = tempfile.NamedTemporaryFile(delete=False, suffix=".docx").name
-                doc.save(temp_doc_path)
-                with open(temp_doc_path, "rb") as doc_file:
-                    st.download_button(
-                        "Download Combined Transcript", 
-                        doc_file, 
-                        file_name="combined_transcript.docx", 
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                    )
+            # Add a download option for the combined transcript (served from memory, re-rendered only after changes)
+            doc_data, doc_mime, _ = st.session_state.exporter.export(st.session_state.timeline, "docx")
+            st.download_button(
+                "Download Combined Transcript",
+                doc_data,
+                file_name="combined_transcript.docx",
+                mime=doc_mime
+            )
         else:
             st.info("No transcript data available. Please upload an SRT file in the Media Upload tab or add frame transcriptions.")
 
@@ -968,15 +902,59 @@ with st.sidebar:
     if not st.session_state.get("saved_frames", {}):
          st.write("No frames selected yet.")
     else:
+        # Transcribe every frame without a transcript in one go, a few requests at a time
+        pending_frames = [n for n, info in st.session_state.saved_frames.items()
+                          if not info.get('has_visual_transcripts', False) and info.get('frame') is not None]
+        if st.session_state.api_calls_saved:
+            st.caption(f"Near-duplicate reuse has saved {st.session_state.api_calls_saved} API call(s) this session.")
+        if pending_frames and st.button(f"Transcribe All Pending Frames ({len(pending_frames)})", key="transcribe_all"):
+            prompt_text = st.session_state['gpt-4o'].get("prompt", "What's in this image?")
+            max_tokens = int(st.session_state["max_words"]) * 4
+            # Only one frame of each group of near-duplicates is sent; the others copy its transcription
+            if st.session_state.dedupe_enabled:
+                unique_frames, reuse = find_duplicates(
+                    {n: frame_hash(st.session_state.saved_frames[n]) for n in pending_frames},
+                    transcribed_frame_hashes(), st.session_state.dedupe_distance)
+            else:
+                unique_frames, reuse = pending_frames, {}
+            calls_saved_before = st.session_state.api_calls_saved
+            for frame_number, source in reuse.items():
+                if source not in unique_frames:
+                    store_transcription(frame_number, st.session_state.saved_frames[source]['visual_transcripts'], source)
+
+            completed, failed = 0, []
+            if unique_frames:
+                progress_bar = st.progress(0.0, text=f"Transcribing {len(unique_frames)} frames...")
+                frames_to_transcribe = {n: st.session_state.saved_frames[n]['frame'] for n in unique_frames}
+                for frame_number, transcription, error in transcribe_frames(frames_to_transcribe, prompt_text, GPT_API_KEY, max_tokens):
+                    completed += 1
+                    if error is not None:
+                        failed.append(frame_number)
+                        st.warning(f"Frame {frame_number} failed: {error}")
+                    else:
+                        store_transcription(frame_number, transcription)
+                    progress_bar.progress(completed / len(unique_frames), text=f"Transcribed {completed} of {len(unique_frames)} frames...")
+                progress_bar.empty()
+            for frame_number, source in reuse.items():
+                if source in unique_frames and source not in failed:
+                    store_transcription(frame_number, st.session_state.saved_frames[source]['visual_transcripts'], source)
+
+            if failed:
+                st.error(f"{len(failed)} frame(s) could not be transcribed: {', '.join(map(str, sorted(failed)))}. Try them again individually.")
+            else:
+                calls_saved = st.session_state.api_calls_saved - calls_saved_before
+                if calls_saved:
+                    st.success(f"Reused transcriptions for {calls_saved} near-duplicate frame(s); {len(unique_frames)} API call(s) made.")
+                st.experimental_rerun()
+
         # Sort frames for consistent display by frame number
         for frame_number in sorted(st.session_state.saved_frames.keys()):
             frame_info = st.session_state.saved_frames[frame_number]
             
-            # Use helper function to get base64
+            # Downscaled thumbnail, encoded once per saved frame
             try:
-                 # Re-create base64 string each time to avoid caching issues
                  if 'frame' in frame_info and frame_info['frame'] is not None:
-                     base64_img = image_to_base64(frame_info['frame']) # Assumes frame is RGB numpy array
+                     base64_img = thumbnail_base64(frame_info) # Assumes frame is RGB numpy array
                  else:
                      st.warning(f"Frame {frame_number} data is missing")
                      # Skip this frame to avoid display errors
@@ -988,6 +966,8 @@ with st.sidebar:
 
             transcript_text = frame_info.get('visual_transcripts', 'No transcript yet') # Use .get for safety
             is_cropped_text = "(Cropped)" if frame_info.get('is_cropped', False) else "(Full Frame)" # Check crop status
+            if frame_info.get('reused_from') is not None:
+                transcript_text = f"{transcript_text}\n(Reused from near-duplicate Frame {frame_info['reused_from']})"
 
             # Display Card using Markdown with error handling
             try:
@@ -1008,15 +988,22 @@ with st.sidebar:
                 # Transcribe Button (only if not already transcribed)
                 if not frame_info.get('has_visual_transcripts', False):
                     if st.button(f"Transcribe #{frame_number}", key=f"btn_{frame_number}"):
+                        # A near-duplicate of an already transcribed frame reuses its transcription
+                        match = None
+                        if st.session_state.dedupe_enabled:
+                            index = HashIndex()
+                            for known_number, known_hash in transcribed_frame_hashes().items():
+                                index.add(known_number, known_hash)
+                            match, distance = index.nearest(frame_hash(frame_info), st.session_state.dedupe_distance)
+                        if match is not None:
+                            store_transcription(frame_number, st.session_state.saved_frames[match]['visual_transcripts'], match)
+                            st.success(f"Frame {frame_number} matches Frame {match} (hash distance {distance}); reused its transcription.")
+                            st.experimental_rerun()
                         st.info(f"Transcribing Frame {frame_number}...")
                         try:
                             # Pass the saved frame data (numpy array) directly
                             saved_frame_data = frame_info['frame'] # This is already RGB
                             
-                            # Get the image as base64 for OpenAI API
-                            img_pil = Image.fromarray(saved_frame_data)
-                            base64_image = encode_image(img_pil)
-                            
                             # Use the GPT-4o prompt from settings
                             prompt_text = st.session_state['gpt-4o'].get("prompt", "What's in this image?")
                             prompt_category = st.session_state.get("prompt_category", "general")
@@ -1035,37 +1022,12 @@ with st.sidebar:
                             max_tokens = int(st.session_state["max_words"]) * 4
                             st.info(f"Using word limit from configuration: {st.session_state['max_words']} tokens")
                             
-                            # Prepare headers and payload for OpenAI API
-                            headers = {"Content-Type": "application/json", "Authorization": f"Bearer {GPT_API_KEY}"}
-                            payload = {
-                                "model": "gpt-4o",
-                                "messages": [
-                                    {"role": "user", "content": [
-                                        {"type": "text", "text": prompt_text},
-                                        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                                    ]}
-                                ],
-                                "max_tokens": int(st.session_state["max_words"]) * 4  # Convert word count to approximate token count (4 tokens per word on average)
-                            }
-                            
-                            # Make API call
-                            response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload)
-                            gpt_response = response.json()
-                            transcription = gpt_response['choices'][0]['message']['content']
-
-                            # Update session state
-                            st.session_state.saved_frames[frame_number]['visual_transcripts'] = transcription
-                            st.session_state.saved_frames[frame_number]['has_visual_transcripts'] = True
-                            st.session_state["transcriptions"][frame_number] = transcription
-                            
-                            # Get timestamp if needed
-                            if st.session_state.get('video') and st.session_state.get('video').isOpened():
-                                try:
-                                    video_obj = st.session_state.video
-                                    st.session_state.saved_frames[frame_number]['time_stamp'] = get_frame_timestamp(frame_number, video_obj)
-                                except Exception as ts_error:
-                                    st.warning(f"Could not get timestamp for Frame {frame_number}: {ts_error}")
-                                    st.session_state.saved_frames[frame_number]['time_stamp'] = "N/A"
+                            # Make API call (retries transient failures); word count converted to an
+                            # approximate token count (4 tokens per word on average)
+                            transcription = transcribe_frame(saved_frame_data, prompt_text, GPT_API_KEY, max_tokens)
+
+                            # Update session state (and the frame's timestamp)
+                            store_transcription(frame_number, transcription)
 
                             st.success(f"Transcription completed for Frame {frame_number}.")
                             st.experimental_rerun()  # Update sidebar display
@@ -1078,32 +1040,22 @@ with st.sidebar:
                     if st.button(f"Insert to Transcript #{frame_number}", key=f"add_{frame_number}"):
                         try:
                             # When a visual transcript is inserted:
-                            # 1. It's added to the existing subtitle text (if matching frame exists)
+                            # 1. It's added to the text of the subtitle showing on that frame (if any)
                             # 2. The frame number is added to inserted_transcriptions set
-                            # 3. The merge_transcripts() function will include it in the combined chronological display
-                            
-                            # Insert into the subtitles dictionary
-                            if frame_number in st.session_state["frame_subtitle_map"]:
-                                # Get existing subtitle text
-                                subtitle_key = None
-                                for start_time, text in st.session_state["subtitles"].items():
-                                    if int(start_time * int(st.session_state.video.get(cv2.CAP_PROP_FPS))) == frame_number:
-                                        subtitle_key = start_time
-                                        break
-                                
-                                if subtitle_key is not None:
-                                    # Add the GPT transcription to the subtitle
-                                    st.session_state["subtitles"][subtitle_key] += f"\n[GPT]: {st.session_state['transcriptions'][frame_number]}"
-                                    # Add this frame to the set of inserted transcriptions
-                                    st.session_state.inserted_transcriptions.add(frame_number)
-                                    st.success(f"Inserted GPT transcription into frame {frame_number} subtitle.")
-                                else:
-                                    st.warning(f"Could not find subtitle for frame {frame_number}.")
+                            # 3. It's inserted into the timeline, which keeps the combined transcript in order
+                            timeline = st.session_state.timeline
+                            transcription = st.session_state['transcriptions'][frame_number]
+                            timestamp = frame_time(frame_number)
+                            cue_index = timeline.cue_at(timestamp)
+                            if cue_index is not None:
+                                # Add the GPT transcription to the subtitle
+                                timeline.set_cue_text(cue_index, timeline.texts[cue_index] + f"\n[GPT]: {transcription}")
+                                st.success(f"Inserted GPT transcription into frame {frame_number} subtitle.")
                             else:
-                                # Even without a subtitle mapping, we can still track that this frame's 
-                                # transcription has been inserted
-                                st.session_state.inserted_transcriptions.add(frame_number)
-                                st.warning(f"No subtitle mapping found for frame {frame_number}, but marked as inserted.")
+                                # Even without a subtitle on this frame, the transcription is still inserted
+                                st.warning(f"No subtitle found for frame {frame_number}, but marked as inserted.")
+                            timeline.insert_visual(frame_number, timestamp, transcription)
+                            st.session_state.inserted_transcriptions.add(frame_number)
                             
                             # Try to use the insert_VT_into_AT utility if available
                             try:
@@ -1131,19 +1083,14 @@ with st.sidebar:
                         if frame_number in st.session_state.transcriptions:
                             del st.session_state.transcriptions[frame_number]
                             
-                        # If this frame has a corresponding subtitle entry, clean up the GPT part
-                        if frame_number in st.session_state["frame_subtitle_map"]:
-                            # Find the subtitle key
-                            subtitle_key = None
-                            for start_time, text in st.session_state["subtitles"].items():
-                                if int(start_time * int(st.session_state.video.get(cv2.CAP_PROP_FPS))) == frame_number:
-                                    subtitle_key = start_time
-                                    break
-                            
-                            if subtitle_key is not None and "\n[GPT]:" in st.session_state["subtitles"][subtitle_key]:
+                        # Take it off the timeline and clean up the GPT part of the subtitle it was added to
+                        timeline = st.session_state.timeline
+                        timestamp = timeline.remove_visual(frame_number)
+                        if timestamp is not None:
+                            cue_index = timeline.cue_at(timestamp)
+                            if cue_index is not None and "\n[GPT]:" in timeline.texts[cue_index]:
                                 # Remove only the GPT part
-                                original_text = st.session_state["subtitles"][subtitle_key].split("\n[GPT]:")[0]
-                                st.session_state["subtitles"][subtitle_key] = original_text
+                                timeline.set_cue_text(cue_index, timeline.texts[cue_index].split("\n[GPT]:")[0])
                         
                         st.success(f"Removed Frame {frame_number} and its transcription.")
                         st.experimental_rerun()  # Update sidebar
@@ -1152,5 +1099,8 @@ with st.sidebar:
     st.sidebar.subheader("Download Options")
     download_transcript()
 
+# Save the workspace after every change so a refresh or restart does not lose it
+persist_project()
+
 # Add spacing at the bottom
 st.markdown("<div style='height: 100px;'></div>", unsafe_allow_html=True)
@@ -1,13 +1,12 @@
 import streamlit as st
-import cv2
 import numpy as np
 import os
 import tempfile
-import base64
 import requests
-from PIL import Image
 from openai import OpenAI
 from docx import Document
+from visual_transcription.utils.frame_server import FrameSequence
+from visual_transcription.utils.image_encoding import image_to_base64
 
 # Initialize OpenAI client
 GPT_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -51,14 +50,12 @@ if video_file and srt_file and st.button("Process Video & Transcript"):
         f.write(video_file.read())
 
     st.session_state["subtitles"] = parse_srt(srt_file)
-    cap = cv2.VideoCapture(temp_video_path)
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
+    # Frames are decoded on demand; only a small cache of them is held in memory
     if not st.session_state.get("frames"):
-        st.session_state["frames"] = [Image.fromarray(cv2.cvtColor(cap.read()[1], cv2.COLOR_BGR2RGB)) for _ in range(total_frames) if cap.read()[0]]
+        st.session_state["frames"] = FrameSequence(temp_video_path)
+    fps = int(st.session_state["frames"].fps)
 
-    cap.release()
     st.session_state["frame_subtitle_map"] = {int(start_time * fps): text for start_time, text in st.session_state["subtitles"].items()}
 
 # Display transcript
@@ -88,13 +85,6 @@ for i, (frame, subtitle) in enumerate(zip(st.session_state["saved_frames"], st.s
     st.sidebar.image(frame, caption=f"Saved Frame {i}")
     st.sidebar.write(subtitle)
 
-# Function to encode image as base64
-def encode_image(image):
-    buffered = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
-    image.save(buffered, format="JPEG")
-    with open(buffered.name, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
-
 # Transcription using OpenAI's API
 if "transcriptions" not in st.session_state:
     st.session_state["transcriptions"] = {}
@@ -102,7 +92,7 @@ if "transcriptions" not in st.session_state:
 for i, (frame, subtitle) in enumerate(zip(st.session_state["saved_frames"], st.session_state["saved_subtitles"])):
     if st.sidebar.button(f"Transcribe Frame {i}"):
         st.sidebar.write(f"Processing transcription for Frame {i}...")
-        base64_image = encode_image(frame)
+        base64_image = image_to_base64(frame)
         headers = {"Content-Type": "application/json", "Authorization": f"Bearer {GPT_API_KEY}"}
         payload = {
             "model": "gpt-4o",